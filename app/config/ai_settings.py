@@ -5,9 +5,9 @@ This module provides configuration settings for AI model interactions.
 These settings can be adjusted based on the specific needs of the application.
 """
 
-from pydantic import Field
+from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 
 class AISettings(BaseSettings):
@@ -31,18 +31,47 @@ class AISettings(BaseSettings):
     # Context window management
     max_context_length: int = Field(default=4000, ge=100, le=8000)
     max_conversation_messages: int = Field(default=10, ge=1, le=100)
+    sliding_window_turns: int = Field(default=4, ge=1, le=50)  # user/assistant pairs sent to the model
+    summary_refresh_turns: int = Field(default=3, ge=1, le=50)  # turns outside the window before re-summarizing
     
     # Moderation settings
     moderation_enabled: bool = True
     moderation_threshold: float = Field(default=0.8, ge=0.0, le=1.0)
+    max_message_length: int = Field(default=10000, ge=1)  # longer messages are refused without an API call
+    moderation_blocklist: List[str] = []  # regex patterns refused without an API call
     
     # Response caching
     enable_caching: bool = False
     cache_ttl_seconds: int = Field(default=3600, ge=60, le=86400)  # 1 hour default
+    semantic_cache_threshold: float = Field(default=0.95, ge=0.0, le=1.0)  # cosine similarity for a hit
+    semantic_cache_size: int = Field(default=1024, ge=1, le=100000)
     
     # Rate limiting
     rate_limit_requests: int = Field(default=60, ge=1)  # requests per minute
     
+    # OpenAI pacing budgets, per minute; corrected from response headers
+    openai_completion_rpm: int = Field(default=500, ge=1)
+    openai_completion_tpm: int = Field(default=30000, ge=1)
+    openai_embedding_rpm: int = Field(default=3000, ge=1)
+    openai_embedding_tpm: int = Field(default=1000000, ge=1)
+    openai_moderation_rpm: int = Field(default=1000, ge=1)
+    
+    # Embedding request batching
+    embedding_batch_size: int = Field(default=16, ge=1, le=2048)
+    embedding_batch_wait_ms: float = Field(default=20.0, ge=0.0, le=1000.0)
+    
+    @model_validator(mode="after")
+    def check_window_fits_history(self) -> "AISettings":
+        """Reject a sliding window larger than the history kept per conversation."""
+        # Messages past the kept history would be neither sent nor summarized
+        if self.sliding_window_turns * 2 > self.max_conversation_messages:
+            raise ValueError(
+                f"sliding_window_turns ({self.sliding_window_turns}) needs "
+                f"{self.sliding_window_turns * 2} messages, but max_conversation_messages "
+                f"is {self.max_conversation_messages}"
+            )
+        return self
+    
     class Config:
         env_prefix = ""
         env_file = ".env"
@@ -50,4 +79,4 @@ class AISettings(BaseSettings):
 
 
 # Create a singleton instance
-ai_settings = AISettings() 
\ No newline at end of file
+ai_settings = AISettings()
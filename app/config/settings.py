@@ -44,6 +44,11 @@ class Settings(BaseSettings):
     DEBUG: bool = Field(False, description="Debug mode")
     ENVIRONMENT: str = Field("development", description="deployment environment")
     
+    # In-process session store for active conversations
+    SESSION_MAX_CONVERSATIONS: int = Field(10000, description="Maximum conversations kept in memory per worker")
+    SESSION_TTL_SECONDS: int = Field(3600, description="Idle time before a conversation is evicted")
+    SESSION_EXPIRE_INTERVAL_SECONDS: int = Field(900, description="How often expired conversations are purged")
+    
     # Service configurations
     LOG: LogSettings = Field(default_factory=LogSettings)
     OPENAI: OpenAISettings = Field(...)
@@ -3,18 +3,23 @@ from app.config.init_env import initialize_environment
 initialize_environment()
 
 import uvicorn
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, JSONResponse
 import os
+import asyncio
+import contextlib
 import logfire
 from pathlib import Path
 
 from app.config.settings import settings
+from app.services.openai_service import close_async_client
+from app.services.session_store import session_store
 from app.api.routes import router as api_router
 from app.web import router as web_router
+from app.web.documents import get_document_service
 
 # Add Logfire startup logging
 logfire.info("Application starting up", 
@@ -32,10 +37,26 @@ TEMPLATES_DIR.mkdir(exist_ok=True)
 STATIC_DIR = Path("app/static")
 STATIC_DIR.mkdir(exist_ok=True)
 
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the session expiry task and release the OpenAI connection pool on shutdown."""
+    # Build the shared DocumentService now rather than on the first request
+    try:
+        get_document_service()
+    except HTTPException:
+        logfire.warning("DocumentService unavailable at startup; will retry on first request")
+    expiry_task = asyncio.create_task(session_store.run_expiry())
+    yield
+    expiry_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await expiry_task
+    await close_async_client()
+
 app = FastAPI(
     title="Support Agent One",
     description="API for customer support agent with document search and customer history",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Add more Logfire logs
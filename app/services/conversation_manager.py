@@ -4,20 +4,95 @@ Conversation Manager Service
 This module manages conversation history, context, and state for the support agent.
 """
 
+import os
+import re
 import time
 import uuid
 import logging
 import logfire
-from typing import List, Dict, Any, Optional, Tuple
+from collections import deque
+from typing import List, Dict, Any, Deque, Optional, Tuple
 from dataclasses import dataclass, field
 
-from app.services.document_retrieval import search_and_format_query
+from app.services.document_retrieval import (
+    ChunkCache,
+    create_context_from_results,
+    retrieve_relevant_chunks
+)
+from app.services.openai_service import get_chat_completion_async, get_embeddings
 from app.services.supabase_service import store_document
 from app.utils.logger import get_logger
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Messages shorter than this are treated as conversational, not questions
+MIN_RETRIEVAL_LENGTH = 10
+
+# Candidate chunks pulled into a conversation's warm cache per index query,
+# with a looser threshold so follow-up questions can be answered locally
+WARM_CACHE_SIZE = 50
+WARM_CACHE_THRESHOLD = 0.5
+
+# Conversation IDs generated per urandom read
+CONVERSATION_ID_BATCH = 256
+_conversation_ids: Deque[str] = deque()
+
+# Acknowledgements that never need a document lookup
+_FILLER_PATTERN = re.compile(
+    r"^(ok|okay|thanks|thank you|thx|ty|lol|got it|cool|great|nice|👍)\W*$",
+    re.IGNORECASE
+)
+
+
+def new_conversation_id() -> str:
+    """
+    Get a fresh random (version 4) UUID string for a conversation.
+    
+    IDs are generated in batches from a single urandom read instead of one
+    read per ID.
+    """
+    try:
+        return _conversation_ids.popleft()
+    except IndexError:
+        raw = os.urandom(16 * CONVERSATION_ID_BATCH)
+        _conversation_ids.extend(
+            str(uuid.UUID(bytes=raw[i:i + 16], version=4))
+            for i in range(0, len(raw), 16)
+        )
+        return _conversation_ids.popleft()
+
+
+def should_retrieve(message: str, recent_turns: List[Dict[str, Any]]) -> bool:
+    """
+    Decide whether a message warrants a document retrieval.
+    
+    Cheap checks only: very short messages, fillers, messages with no
+    letters or digits (emoji, punctuation) and repeats of a recent user
+    question reuse the context already attached to the conversation.
+    
+    Args:
+        message: The user's message
+        recent_turns: Recent conversation history, oldest first
+        
+    Returns:
+        True if relevant context should be retrieved for this message
+    """
+    text = message.strip()
+    
+    if len(text) < MIN_RETRIEVAL_LENGTH or _FILLER_PATTERN.match(text):
+        return False
+        
+    if not any(char.isalnum() for char in text):
+        return False
+        
+    normalized = text.casefold()
+    for turn in recent_turns:
+        if turn["role"] == "user" and turn["content"].strip().casefold() == normalized:
+            return False
+            
+    return True
+
 
 @dataclass
 class Message:
@@ -37,6 +112,44 @@ class ConversationContext:
     messages: List[Message] = field(default_factory=list)
     metadata: Dict[str, Any] = field(default_factory=dict)
     relevant_docs: str = ""  # Relevant document context for the current query
+    summary: str = ""  # Rolling summary of messages that slid out of the context window
+    summarized_count: int = 0  # Number of leading messages covered by the summary
+    warm_cache: Optional[ChunkCache] = None  # Candidate chunks for follow-up queries
+    chat_window: Deque[Dict[str, str]] = field(default_factory=deque)  # Recent messages, formatted for the chat API
+
+
+def trim_context(
+    chat_context: List[Dict[str, str]],
+    max_turns: int,
+    summary: Optional[str] = None
+) -> List[Dict[str, str]]:
+    """
+    Cap a chat context to a sliding window of recent turns.
+    
+    Keeps the leading system prompt, adds the rolling summary of older
+    messages as a second system message, and keeps only the last
+    max_turns user/assistant pairs.
+    
+    Args:
+        chat_context: Context as returned by ConversationManager.get_chat_context
+        max_turns: Number of user/assistant pairs to keep
+        summary: Optional summary of the conversation before the window
+        
+    Returns:
+        The trimmed context
+    """
+    system_messages = []
+    if chat_context and chat_context[0]["role"] == "system":
+        system_messages = [chat_context[0]]
+        chat_context = chat_context[1:]
+        
+    if summary:
+        system_messages.append({
+            "role": "system",
+            "content": f"Summary of the earlier conversation:\n{summary}"
+        })
+        
+    return system_messages + chat_context[-max_turns * 2:]
 
 
 class ConversationManager:
@@ -77,7 +190,7 @@ class ConversationManager:
         """
         # Use provided ID or generate a new one
         if not conversation_id:
-            conversation_id = str(uuid.uuid4())
+            conversation_id = new_conversation_id()
         
         # Check if this ID is already in use
         if conversation_id in self.active_conversations:
@@ -90,7 +203,8 @@ class ConversationManager:
             conversation_id=conversation_id,
             customer_id=customer_id,
             product_id=product_id,
-            metadata=metadata or {}
+            metadata=metadata or {},
+            chat_window=deque(maxlen=self.max_conversation_length)
         )
         
         self.active_conversations[conversation_id] = context
@@ -146,12 +260,21 @@ class ConversationManager:
             metadata=metadata or {}
         )
         
-        self.active_conversations[conversation_id].messages.append(message)
+        self._append_message(self.active_conversations[conversation_id], message)
         logger.debug(f"Added {role} message to conversation {conversation_id}")
         logfire.debug(f"Added {role} message to conversation", 
                      conversation_id=conversation_id,
                      message_count=len(self.active_conversations[conversation_id].messages))
         
+    @staticmethod
+    def _append_message(context: ConversationContext, message: Message) -> None:
+        """Append a message to the history and to the formatted chat window."""
+        context.messages.append(message)
+        context.chat_window.append({
+            "role": message.role,
+            "content": message.content
+        })
+        
     def get_conversation_history(
         self,
         conversation_id: str,
@@ -203,21 +326,70 @@ class ConversationManager:
         
         return history
         
+    def get_messages_since(
+        self,
+        conversation_id: str,
+        since: int = -1
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the messages added after a given message ID.
+        
+        Message IDs are positions in the conversation, so only the tail of
+        the message list is copied rather than the full history.
+        
+        Args:
+            conversation_id: The conversation identifier
+            since: ID of the last message the caller has seen (-1 for all)
+            
+        Returns:
+            List of newer messages, each including its ID
+            
+        Raises:
+            ValueError: If the conversation ID is invalid
+        """
+        if conversation_id not in self.active_conversations:
+            logfire.error("Invalid conversation ID in get_messages_since", 
+                         conversation_id=conversation_id)
+            raise ValueError(f"Invalid conversation ID: {conversation_id}")
+            
+        messages = self.active_conversations[conversation_id].messages
+        start = max(since + 1, 0)
+        
+        return [
+            {
+                "id": message_id,
+                "role": msg.role,
+                "content": msg.content,
+                "timestamp": msg.timestamp,
+                "metadata": msg.metadata
+            }
+            for message_id, msg in enumerate(messages[start:], start=start)
+        ]
+        
     def retrieve_relevant_context(
         self,
         conversation_id: str,
         query: str,
         limit: int = 5,
-        threshold: float = 0.7
+        threshold: float = 0.7,
+        prefetch: bool = False,
+        query_embedding: Optional[List[float]] = None
     ) -> str:
         """
         Retrieve relevant context for a query and update the conversation.
         
+        Queries are first ranked against the conversation's warm cache; the
+        vector index is only queried when the cache is empty, has nothing
+        above the threshold, or prefetch is requested, and each index query
+        refills the cache with up to WARM_CACHE_SIZE candidates.
+        
         Args:
             conversation_id: The conversation identifier
             query: The user's query
             limit: Maximum number of document chunks to retrieve
             threshold: Similarity threshold for retrieval
+            prefetch: Refill the warm cache from the index regardless of its contents
+            query_embedding: Precomputed embedding for the query, if available
             
         Returns:
             Context string with relevant information
@@ -246,19 +418,36 @@ class ConversationManager:
             
         # Retrieve relevant documents
         try:
-            relevant_docs = search_and_format_query(
-                query=query,
-                limit=limit,
-                threshold=threshold,
-                filters=filters
-            )
+            if query_embedding is None:
+                query_embedding = get_embeddings([query])[0]
+            
+            results = []
+            cache_hit = False
+            if context.warm_cache and not prefetch:
+                results = context.warm_cache.search(query_embedding, limit=limit, threshold=threshold)
+                cache_hit = bool(results)
+                
+            if not cache_hit:
+                context.warm_cache = ChunkCache(retrieve_relevant_chunks(
+                    query=query,
+                    limit=WARM_CACHE_SIZE,
+                    threshold=min(threshold, WARM_CACHE_THRESHOLD),
+                    filters=filters,
+                    query_embedding=query_embedding,
+                    include_embeddings=True
+                ))
+                results = context.warm_cache.search(query_embedding, limit=limit, threshold=threshold)
+                
+            relevant_docs = create_context_from_results(results) if results else ""
             
             # Update conversation context with relevant documents
             context.relevant_docs = relevant_docs
             
             logfire.info("Retrieved relevant context", 
                         conversation_id=conversation_id,
-                        context_length=len(relevant_docs))
+                        context_length=len(relevant_docs),
+                        cache_hit=cache_hit,
+                        warm_cache_size=len(context.warm_cache))
                         
             return relevant_docs
         except Exception as e:
@@ -301,12 +490,8 @@ class ConversationManager:
             "content": self._get_system_prompt(context)
         }]
         
-        # Add conversation history, limited by max length
-        for message in context.messages[-self.max_conversation_length:]:
-            chat_messages.append({
-                "role": message.role,
-                "content": message.content
-            })
+        # Add conversation history, already limited to max length
+        chat_messages.extend(context.chat_window)
             
         logfire.debug("Chat context prepared", 
                      conversation_id=conversation_id,
@@ -314,6 +499,162 @@ class ConversationManager:
             
         return chat_messages
         
+    def prepare_turn(
+        self,
+        conversation_id: str,
+        user_message: str,
+        max_turns: int
+    ) -> List[Dict[str, str]]:
+        """
+        Record the user's message and build the context for its completion.
+        
+        Equivalent to add_message, get_chat_context and trim_context in
+        sequence, but resolves the conversation once and only copies the
+        messages that fit in the window. Retrieval is not included, so it
+        can still run alongside moderation before the message is recorded.
+        
+        Args:
+            conversation_id: The conversation identifier
+            user_message: The user's message
+            max_turns: Number of user/assistant pairs to keep
+            
+        Returns:
+            Formatted context for chat completion API, capped to the recent
+            window plus the rolling summary
+            
+        Raises:
+            ValueError: If the conversation ID is invalid
+        """
+        context = self.active_conversations.get(conversation_id)
+        if context is None:
+            logfire.error("Invalid conversation ID in prepare_turn", 
+                         conversation_id=conversation_id)
+            raise ValueError(f"Invalid conversation ID: {conversation_id}")
+            
+        self._append_message(context, Message(role="user", content=user_message))
+        
+        chat_messages = [{
+            "role": "system",
+            "content": self._get_system_prompt(context)
+        }]
+        chat_messages.extend(context.chat_window)
+        
+        return trim_context(chat_messages, max_turns, context.summary)
+        
+    def get_prompt_inputs(self, conversation_id: str) -> Tuple[str, str, str, str]:
+        """
+        Get the values a conversation's reply is grounded in besides its turns.
+        
+        These are what _get_system_prompt and the rolling summary add to the
+        chat context, so cached replies can be keyed on them.
+        
+        Args:
+            conversation_id: The conversation identifier
+            
+        Returns:
+            Customer ID, product ID, retrieved documents and summary
+            (empty strings where unset)
+            
+        Raises:
+            ValueError: If the conversation ID is invalid
+        """
+        if conversation_id not in self.active_conversations:
+            raise ValueError(f"Invalid conversation ID: {conversation_id}")
+            
+        context = self.active_conversations[conversation_id]
+        return (
+            context.customer_id or "",
+            context.product_id or "",
+            context.relevant_docs,
+            context.summary
+        )
+        
+    def summary_due(
+        self,
+        conversation_id: str,
+        window_messages: int,
+        refresh_every: int
+    ) -> bool:
+        """
+        Check whether enough messages have left the context window unsummarized.
+        
+        Args:
+            conversation_id: The conversation identifier
+            window_messages: Number of recent messages kept in the context window
+            refresh_every: Number of unsummarized messages that triggers a refresh
+            
+        Returns:
+            True if the summary should be refreshed
+            
+        Raises:
+            ValueError: If the conversation ID is invalid
+        """
+        if conversation_id not in self.active_conversations:
+            raise ValueError(f"Invalid conversation ID: {conversation_id}")
+            
+        context = self.active_conversations[conversation_id]
+        outside_window = len(context.messages) - window_messages
+        return outside_window - context.summarized_count >= refresh_every
+        
+    async def refresh_summary(self, conversation_id: str, window_messages: int) -> str:
+        """
+        Fold the messages that left the context window into the rolling summary.
+        
+        Only messages not yet covered are sent to the model, together with the
+        previous summary, so each refresh costs the size of the new messages.
+        The completion goes through the async client so it shares the
+        completion pacing with chat turns.
+        
+        Args:
+            conversation_id: The conversation identifier
+            window_messages: Number of recent messages kept in the context window
+            
+        Returns:
+            The updated summary
+            
+        Raises:
+            ValueError: If the conversation ID is invalid
+        """
+        if conversation_id not in self.active_conversations:
+            raise ValueError(f"Invalid conversation ID: {conversation_id}")
+            
+        context = self.active_conversations[conversation_id]
+        window_start = len(context.messages) - window_messages
+        new_messages = context.messages[context.summarized_count:window_start]
+        
+        if not new_messages:
+            return context.summary
+            
+        transcript = "\n".join(
+            f"{msg.role.upper()}: {msg.content}"
+            for msg in new_messages
+        )
+        if context.summary:
+            transcript = f"Summary so far:\n{context.summary}\n\nNew messages:\n{transcript}"
+            
+        summary = await get_chat_completion_async(
+            messages=[
+                {
+                    "role": "system",
+                    "content": "Summarize this support conversation in a few sentences. "
+                               "Keep the customer's problem, details they provided and any answers given."
+                },
+                {"role": "user", "content": transcript}
+            ],
+            temperature=0.2,
+            max_tokens=300
+        )
+        
+        context.summary = summary
+        context.summarized_count = window_start
+        
+        logfire.info("Conversation summary refreshed", 
+                    conversation_id=conversation_id,
+                    summarized_messages=window_start,
+                    summary_length=len(summary))
+        
+        return summary
+        
     def _get_system_prompt(self, context: ConversationContext) -> str:
         """
         Construct the system prompt for a conversation.
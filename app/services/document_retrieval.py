@@ -8,6 +8,9 @@ based on semantic similarity using vector search.
 import logging
 from typing import List, Dict, Any, Optional, Union, Tuple
 
+import numpy as np
+import orjson
+
 from app.services.openai_service import get_embeddings
 from app.services.supabase_service import search_similar_chunks
 from app.utils.logger import get_logger
@@ -20,11 +23,85 @@ class DocumentRetrievalError(Exception):
     pass
 
 
+class ChunkCache:
+    """
+    In-process candidate set of document chunks ranked by cosine similarity.
+    
+    Filled from a single wide index query, so follow-up queries on the same
+    topic can be answered without another round trip to the vector index.
+    """
+    
+    def __init__(self, chunks: List[Dict[str, Any]]):
+        """
+        Initialize the cache from chunks returned with their embeddings.
+        
+        Args:
+            chunks: Chunks as returned by search_similar_chunks(include_embeddings=True)
+        """
+        self.chunks = []
+        embeddings = []
+        for chunk in chunks:
+            chunk = dict(chunk)
+            embedding = chunk.pop("embedding", None)
+            if embedding is None:
+                continue
+            # PostgREST serializes pgvector columns as "[x,y,...]" strings
+            if isinstance(embedding, str):
+                embedding = orjson.loads(embedding)
+            self.chunks.append(chunk)
+            embeddings.append(embedding)
+            
+        if embeddings:
+            matrix = np.asarray(embeddings, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            self.matrix = matrix / np.where(norms == 0, 1, norms)
+        else:
+            self.matrix = np.empty((0, 0), dtype=np.float32)
+            
+    def __len__(self) -> int:
+        return len(self.chunks)
+        
+    def search(
+        self,
+        query_embedding: List[float],
+        limit: int = 5,
+        threshold: float = 0.7
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank the cached chunks against a query embedding.
+        
+        Args:
+            query_embedding: The embedding vector to search for
+            limit: Maximum number of chunks to return
+            threshold: Similarity threshold (0.0 to 1.0)
+            
+        Returns:
+            Chunks above the threshold, most similar first
+        """
+        if not self.chunks:
+            return []
+            
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+            
+        scores = self.matrix @ (query / norm)
+        top = np.argsort(-scores)[:limit]
+        return [
+            {**self.chunks[i], "similarity": float(scores[i])}
+            for i in top
+            if scores[i] > threshold
+        ]
+
+
 def retrieve_relevant_chunks(
     query: str,
     limit: int = 5,
     threshold: float = 0.7,
-    filters: Optional[Dict[str, Any]] = None
+    filters: Optional[Dict[str, Any]] = None,
+    query_embedding: Optional[List[float]] = None,
+    include_embeddings: bool = False
 ) -> List[Dict[str, Any]]:
     """
     Retrieve document chunks relevant to a natural language query.
@@ -34,6 +111,8 @@ def retrieve_relevant_chunks(
         limit: Maximum number of chunks to retrieve
         threshold: Similarity threshold (0.0 to 1.0)
         filters: Optional metadata filters to apply
+        query_embedding: Precomputed embedding for the query, if available
+        include_embeddings: Whether to return each chunk's embedding as well
         
     Returns:
         List of relevant document chunks with similarity scores
@@ -45,14 +124,16 @@ def retrieve_relevant_chunks(
         logger.info(f"Retrieving documents for query: {query}")
         
         # Generate embedding for the query
-        query_embedding = get_embeddings([query])[0]
-        logger.debug("Generated query embedding")
+        if query_embedding is None:
+            query_embedding = get_embeddings([query])[0]
+            logger.debug("Generated query embedding")
         
         # Search for similar chunks
         results = search_similar_chunks(
             query_embedding=query_embedding,
             limit=limit,
-            threshold=threshold
+            threshold=threshold,
+            include_embeddings=include_embeddings
         )
         
         # Apply additional filters if provided
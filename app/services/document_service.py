@@ -1,15 +1,17 @@
 import os
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Union, TextIO
 import json
+import threading
 from supabase import create_client
 from dotenv import load_dotenv
 import uuid
+from cachetools import TTLCache
 
 # Import our new components
 from app.utils.text_chunker import chunk_text, ChunkingStrategy
 from app.utils.embedding_pipeline import process_text, process_document as pipeline_process_document
-from app.services.document_storage import DocumentStorage
+from app.services.document_storage import DocumentStorage, DocumentStorageError
 from app.utils.openai_client import get_openai_client
 
 # Load environment variables
@@ -45,6 +47,18 @@ class DocumentService:
         self.MAX_RESULTS = 5
         self.DEFAULT_CHUNK_SIZE = 1000
         self.DEFAULT_CHUNK_OVERLAP = 200
+        self.KEYWORD_WEIGHT = 0.4
+        self.SEMANTIC_WEIGHT = 0.6
+        
+        # Recent search results by normalized query; cleared on document writes.
+        # Shared by the threadpool workers, so access goes through the lock
+        self._search_cache = TTLCache(maxsize=256, ttl=300)
+        self._search_cache_lock = threading.Lock()
+    
+    def _clear_search_cache(self) -> None:
+        """Drop cached search results after a document write."""
+        with self._search_cache_lock:
+            self._search_cache.clear()
     
     def create_embedding(self, text: str) -> List[float]:
         """
@@ -68,7 +82,10 @@ class DocumentService:
     
     def search_documents(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """
-        Search for documents relevant to a query using vector similarity.
+        Search for documents relevant to a query using keyword rank and vector similarity.
+        
+        Falls back to vector similarity alone if the hybrid search function
+        is not installed.
         
         Args:
             query: The search query
@@ -77,20 +94,40 @@ class DocumentService:
         Returns:
             A list of document dictionaries
         """
+        limit = min(limit, self.MAX_RESULTS)
+        cache_key = (" ".join(query.lower().split()), limit)
+        with self._search_cache_lock:
+            cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            # Hand out copies so callers can't alter later hits
+            return [dict(document) for document in cached]
+        
         try:
             # Create embedding for the query
             query_embedding = self.create_embedding(query)
             
-            # Perform vector search using our document storage service
-            documents = self.document_storage.search_documents(
-                query_embedding=query_embedding,
-                limit=min(limit, self.MAX_RESULTS),
-                similarity_threshold=self.SIMILARITY_THRESHOLD
-            )
+            try:
+                documents = self.document_storage.hybrid_search_documents(
+                    query=query,
+                    query_embedding=query_embedding,
+                    limit=limit,
+                    similarity_threshold=self.SIMILARITY_THRESHOLD,
+                    keyword_weight=self.KEYWORD_WEIGHT,
+                    semantic_weight=self.SEMANTIC_WEIGHT
+                )
+            except DocumentStorageError as e:
+                logger.warning(f"Hybrid search unavailable, using vector search: {str(e)}")
+                documents = self.document_storage.search_documents(
+                    query_embedding=query_embedding,
+                    limit=limit,
+                    similarity_threshold=self.SIMILARITY_THRESHOLD
+                )
             
             # Log the number of documents found
             logger.info(f"Found {len(documents)} relevant documents for query: {query}")
             
+            with self._search_cache_lock:
+                self._search_cache[cache_key] = tuple(dict(document) for document in documents)
             return documents
         except Exception as e:
             logger.error(f"Error searching documents: {str(e)}")
@@ -115,7 +152,7 @@ class DocumentService:
     def store_document(
         self, 
         title: str, 
-        content: str, 
+        content: Union[str, TextIO], 
         metadata: Dict[str, Any] = None,
         chunk_size: int = None,
         chunk_overlap: int = None,
@@ -126,7 +163,7 @@ class DocumentService:
         
         Args:
             title: The document title
-            content: The document content
+            content: The document content, as a string or a text file object
             metadata: Additional metadata for the document
             chunk_size: Size of text chunks (defaults to class default)
             chunk_overlap: Overlap between chunks (defaults to class default)
@@ -135,7 +172,13 @@ class DocumentService:
         Returns:
             The document object if successful, None otherwise
         """
+        self._clear_search_cache()
+        
         try:
+            # Chunking and the stored document both need the full text
+            if not isinstance(content, str):
+                content = content.read()
+            
             # Set default values if not provided
             chunk_size = chunk_size or self.DEFAULT_CHUNK_SIZE
             chunk_overlap = chunk_overlap or self.DEFAULT_CHUNK_OVERLAP
@@ -210,6 +253,8 @@ class DocumentService:
         Returns:
             True if successful, False otherwise
         """
+        self._clear_search_cache()
+        
         try:
             # Get existing document
             existing_doc = self.get_document_by_id(doc_id)
@@ -298,6 +343,8 @@ class DocumentService:
         Returns:
             True if successful, False otherwise
         """
+        self._clear_search_cache()
+        
         try:
             return self.document_storage.delete_document(doc_id)
         except Exception as e:
@@ -487,4 +487,52 @@ class DocumentStorage:
             
         except Exception as e:
             logger.error(f"Error searching documents: {str(e)}")
-            return [] 
\ No newline at end of file
+            return []
+    
+    def hybrid_search_documents(
+        self,
+        query: str,
+        query_embedding: List[float],
+        limit: int = 5,
+        similarity_threshold: float = 0.7,
+        keyword_weight: float = 0.4,
+        semantic_weight: float = 0.6
+    ) -> List[Dict[str, Any]]:
+        """
+        Search for documents using full-text rank combined with vector similarity.
+        
+        Args:
+            query: The raw query text, matched against chunk content
+            query_embedding: The query embedding vector
+            limit: Maximum number of results to return
+            similarity_threshold: Minimum vector similarity for chunks without a keyword match
+            keyword_weight: Weight of the normalized keyword rank
+            semantic_weight: Weight of the cosine similarity
+            
+        Returns:
+            List of matching document chunks, with the combined score as similarity
+            
+        Raises:
+            DocumentStorageError: If the search function fails or is not installed
+        """
+        try:
+            response = self.supabase.rpc(
+                "hybrid_search_document_chunks",
+                {
+                    "query_text": query,
+                    "query_embedding": query_embedding,
+                    "match_count": limit,
+                    "match_threshold": similarity_threshold,
+                    "keyword_weight": keyword_weight,
+                    "semantic_weight": semantic_weight
+                }
+            ).execute()
+        except Exception as e:
+            raise DocumentStorageError(f"Hybrid search failed: {str(e)}")
+        
+        if hasattr(response, "error") and response.error:
+            raise DocumentStorageError(f"Error in hybrid search: {response.error}")
+        
+        results = response.data if response.data else []
+        logger.info(f"Found {len(results)} relevant document chunks (hybrid)")
+        return results
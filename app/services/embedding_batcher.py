@@ -0,0 +1,80 @@
+"""
+Embedding Batcher Service
+
+This module coalesces single-text embedding requests from concurrent chat
+turns into one embeddings call with an array input, so many clients share
+a round trip and count as one request against the rate limit.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import List
+
+from app.config.ai_settings import ai_settings
+from app.services.openai_service import get_embeddings_async
+from app.services.request_batcher import RequestBatcher
+
+
+@dataclass
+class PendingEmbedding:
+    """A queued text and the future its caller is awaiting."""
+    text: str
+    future: asyncio.Future
+
+
+class EmbeddingBatcher(RequestBatcher):
+    """
+    Collects texts from a single queue and embeds each batch with one
+    get_embeddings_async call.
+    """
+
+    kind = "embedding"
+
+    def __init__(self, max_batch_size: int = None, max_wait_ms: float = None):
+        """
+        Initialize the embedding batcher.
+
+        Args:
+            max_batch_size: Maximum number of texts embedded together
+            max_wait_ms: Maximum time to wait for a batch to fill, in milliseconds
+        """
+        if max_wait_ms is None:
+            max_wait_ms = ai_settings.embedding_batch_wait_ms
+        super().__init__(max_batch_size or ai_settings.embedding_batch_size, max_wait_ms)
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        Queue a text and wait for its embedding.
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            The embedding vector
+
+        Raises:
+            OpenAIServiceError: If the underlying embeddings call fails
+            RateLimitExceededError: If the rate limit is exceeded
+        """
+        future = asyncio.get_running_loop().create_future()
+        return await self._enqueue(PendingEmbedding(text, future))
+
+    async def _dispatch_batch(self, batch: List[PendingEmbedding]) -> None:
+        """Embed a batch with one call and resolve each caller's future."""
+        pending = [item for item in batch if not item.future.done()]
+        if not pending:
+            return
+        try:
+            embeddings = await get_embeddings_async([item.text for item in pending])
+        except Exception as e:
+            for item in pending:
+                if not item.future.done():
+                    item.future.set_exception(e)
+        else:
+            for item, embedding in zip(pending, embeddings):
+                if not item.future.done():
+                    item.future.set_result(embedding)
+
+
+# Create a global embedding batcher instance
+embedding_batcher = EmbeddingBatcher()
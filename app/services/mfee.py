@@ -0,0 +1,84 @@
+"""
+Message Fast-Exit Evaluation
+
+This module classifies incoming chat messages with cheap local checks so the
+chat handlers can reject malformed input and skip the moderation and
+completion API calls for turns whose outcome is already known.
+"""
+
+import re
+import unicodedata
+from typing import Literal, Optional, Pattern
+
+from app.config.ai_settings import ai_settings, AISettings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+Verdict = Literal["INVALID", "DIRECT", "MODERATE", "RENDER"]
+
+# Unicode categories that do not occur in typed text: controls, surrogates,
+# private use and unassigned code points
+_GARBAGE_CATEGORIES = frozenset({"Cc", "Cs", "Co", "Cn"})
+_ALLOWED_CONTROLS = frozenset("\n\r\t")
+MAX_GARBAGE_RATIO = 0.1
+
+# Acknowledgements that cannot carry harmful content
+_ACKNOWLEDGEMENT_PATTERN = re.compile(
+    r"^(ok|okay|thanks|thank you|thx|ty|got it|cool|great|nice)[\s.!]*$",
+    re.IGNORECASE
+)
+
+# Rules derived from the settings, compiled once at import
+_max_length: int = ai_settings.max_message_length
+_blocklist: Optional[Pattern[str]] = None
+
+
+def _compile_rules(settings: AISettings = ai_settings) -> None:
+    """Compile the configured blocklist into a single pattern."""
+    global _max_length, _blocklist
+    _max_length = settings.max_message_length
+    _blocklist = None
+    if settings.moderation_blocklist:
+        _blocklist = re.compile(
+            "|".join(f"(?:{pattern})" for pattern in settings.moderation_blocklist),
+            re.IGNORECASE
+        )
+
+_compile_rules()
+
+
+def _is_garbage(message: str) -> bool:
+    """Check whether a message is mostly non-text code points."""
+    if "\x00" in message:
+        return True
+    garbage = sum(
+        1 for char in message
+        if char not in _ALLOWED_CONTROLS and unicodedata.category(char) in _GARBAGE_CATEGORIES
+    )
+    return garbage > len(message) * MAX_GARBAGE_RATIO
+
+
+def classify(message: str) -> Verdict:
+    """
+    Classify a chat message before any API call is made.
+    
+    Args:
+        message: The user's message
+        
+    Returns:
+        "INVALID" if the message is not usable input (empty, oversized or
+        binary), "DIRECT" if it matches the blocklist and should be refused
+        without calling moderation or completion, "RENDER" if it can go
+        straight to completion, or "MODERATE" if it needs the moderation check
+    """
+    if not message.strip() or len(message) > _max_length:
+        return "INVALID"
+    if _is_garbage(message):
+        return "INVALID"
+    if _blocklist is not None and _blocklist.search(message):
+        logger.info("Message matched moderation blocklist")
+        return "DIRECT"
+    if _ACKNOWLEDGEMENT_PATTERN.match(message.strip()):
+        return "RENDER"
+    return "MODERATE"
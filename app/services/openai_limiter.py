@@ -0,0 +1,133 @@
+"""
+OpenAI Limiter Service
+
+This module paces OpenAI requests with token buckets for requests and tokens
+per minute, so bursts wait for capacity instead of being sent and rejected
+with 429 errors. Buckets are corrected from the rate-limit headers OpenAI
+returns with each response.
+"""
+
+import asyncio
+import time
+from typing import Iterable, Mapping, Optional
+
+from app.config.ai_settings import ai_settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Rough characters-per-token ratio for English text, used to estimate
+# request sizes without a tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(texts: Iterable[str]) -> int:
+    """
+    Estimate the number of tokens in a set of texts.
+    
+    Args:
+        texts: Texts sent in a request
+        
+    Returns:
+        Estimated token count, at least 1
+    """
+    return max(1, sum(len(text) for text in texts) // CHARS_PER_TOKEN)
+
+
+class OpenAILimiter:
+    """
+    Token buckets for requests per minute and, optionally, tokens per minute.
+    
+    Buckets start full and refill continuously; acquire waits until both
+    have enough capacity. Waiters are served in arrival order.
+    """
+    
+    def __init__(self, requests_per_minute: int, tokens_per_minute: Optional[int] = None):
+        """
+        Initialize the limiter.
+        
+        Args:
+            requests_per_minute: Request budget per minute
+            tokens_per_minute: Token budget per minute, or None for no token limit
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._available_requests = float(requests_per_minute)
+        self._available_tokens = float(tokens_per_minute or 0)
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+        
+    def _refill(self) -> None:
+        """Add the capacity accrued since the last refill."""
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._available_requests = min(
+            self.requests_per_minute,
+            self._available_requests + elapsed * self.requests_per_minute / 60
+        )
+        if self.tokens_per_minute:
+            self._available_tokens = min(
+                self.tokens_per_minute,
+                self._available_tokens + elapsed * self.tokens_per_minute / 60
+            )
+            
+    async def acquire(self, tokens: int = 0) -> None:
+        """
+        Wait until a request of the given size fits in the budget, then take it.
+        
+        Args:
+            tokens: Estimated tokens the request will consume
+        """
+        if self.tokens_per_minute:
+            # A request larger than the whole budget can only wait for a full bucket
+            tokens = min(tokens, self.tokens_per_minute)
+        else:
+            tokens = 0
+            
+        async with self._lock:
+            while True:
+                self._refill()
+                request_deficit = 1 - self._available_requests
+                token_deficit = tokens - self._available_tokens
+                if request_deficit <= 0 and token_deficit <= 0:
+                    self._available_requests -= 1
+                    self._available_tokens -= tokens
+                    return
+                    
+                wait = request_deficit * 60 / self.requests_per_minute
+                if token_deficit > 0:
+                    wait = max(wait, token_deficit * 60 / self.tokens_per_minute)
+                logger.debug(f"Pacing OpenAI request for {wait:.2f}s")
+                await asyncio.sleep(wait)
+                
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Correct the buckets from OpenAI's x-ratelimit-* response headers.
+        
+        Args:
+            headers: Response headers from an OpenAI API call
+        """
+        try:
+            limit_requests = headers.get("x-ratelimit-limit-requests")
+            if limit_requests:
+                self.requests_per_minute = int(limit_requests)
+            limit_tokens = headers.get("x-ratelimit-limit-tokens")
+            if limit_tokens and self.tokens_per_minute:
+                self.tokens_per_minute = int(limit_tokens)
+                
+            # The server's view includes other processes sharing the key
+            remaining_requests = headers.get("x-ratelimit-remaining-requests")
+            if remaining_requests:
+                self._available_requests = min(self._available_requests, float(remaining_requests))
+            remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+            if remaining_tokens and self.tokens_per_minute:
+                self._available_tokens = min(self._available_tokens, float(remaining_tokens))
+        except ValueError:
+            logger.debug("Ignoring malformed rate limit headers")
+
+
+# Create global limiter instances, one per OpenAI endpoint family
+completion_limiter = OpenAILimiter(ai_settings.openai_completion_rpm, ai_settings.openai_completion_tpm)
+embedding_limiter = OpenAILimiter(ai_settings.openai_embedding_rpm, ai_settings.openai_embedding_tpm)
+moderation_limiter = OpenAILimiter(ai_settings.openai_moderation_rpm)
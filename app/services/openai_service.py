@@ -7,11 +7,15 @@ request formatting, error handling, and retry logic.
 
 import os
 import time
+import hashlib
 import logging
+import threading
 from typing import List, Dict, Any, Optional, Union, Tuple
 
+import httpx
 import openai
-from openai import OpenAI
+from cachetools import TTLCache
+from openai import OpenAI, AsyncOpenAI
 from tenacity import (
     retry,
     stop_after_attempt,
@@ -23,11 +27,24 @@ from app.config.settings import settings
 from app.config.ai_settings import ai_settings
 from app.utils.logger import get_logger
 from app.utils.rate_limiter import rate_limiter
+from app.services.openai_limiter import (
+    completion_limiter,
+    embedding_limiter,
+    moderation_limiter,
+    estimate_tokens
+)
 
 logger = get_logger(__name__)
 
-# Initialize the OpenAI client
+# Initialize the OpenAI clients. The async client multiplexes concurrent
+# requests as HTTP/2 streams over a shared connection pool.
 client = OpenAI(api_key=settings.OPENAI_API_KEY)
+async_http_client = httpx.AsyncClient(
+    http2=True,
+    timeout=httpx.Timeout(30.0, connect=5.0),
+    limits=httpx.Limits(max_keepalive_connections=100, max_connections=200)
+)
+async_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, http_client=async_http_client)
 
 # Constants
 EMBEDDING_MODEL = ai_settings.embedding_model
@@ -35,6 +52,13 @@ COMPLETION_MODEL = ai_settings.model
 MAX_TOKENS = ai_settings.max_tokens
 EMBEDDING_DIMENSIONS = 1536
 
+# Bump to invalidate cached moderation verdicts when the policy changes
+MODERATION_POLICY_VERSION = 1
+
+# Moderation verdicts keyed by (policy version, message digest)
+_moderation_cache: TTLCache = TTLCache(maxsize=4096, ttl=3600)
+_moderation_cache_lock = threading.Lock()
+
 
 class OpenAIServiceError(Exception):
     """Custom exception for OpenAI service errors."""
@@ -176,6 +200,142 @@ def get_chat_completion(
         raise OpenAIServiceError(f"Failed to generate chat completion: {str(e)}")
 
 
+@retry(
+    retry=retry_if_exception_type((openai.RateLimitError, openai.APITimeoutError)),
+    wait=wait_exponential(multiplier=1, min=2, max=60),
+    stop=stop_after_attempt(5),
+    before_sleep=lambda retry_state: logger.warning(
+        f"Retrying API call after error: {retry_state.outcome.exception()}. "
+        f"Attempt {retry_state.attempt_number}/{retry_state.retry_state.stop.get_stop_after_attempt()}"
+    )
+)
+async def get_embeddings_async(texts: List[str]) -> List[List[float]]:
+    """
+    Generate embeddings for a list of text strings using the async OpenAI client.
+    
+    Sends all texts in a single request, so callers should keep batches
+    within the API's input limit.
+    
+    Args:
+        texts: List of text strings to generate embeddings for
+        
+    Returns:
+        List of embedding vectors (each as a list of floats)
+        
+    Raises:
+        OpenAIServiceError: If an error occurs during the API call
+        RateLimitExceededError: If the rate limit is exceeded
+    """
+    try:
+        logger.debug(f"Generating embeddings for {len(texts)} texts")
+        
+        # Check rate limit before proceeding
+        if not rate_limiter.check_rate_limit("embeddings"):
+            retry_after = rate_limiter.get_retry_after("embeddings")
+            logger.warning(f"Rate limit exceeded for embeddings. Retry after {retry_after} seconds.")
+            raise RateLimitExceededError(retry_after)
+            
+        # Wait for pacing budget, then correct it from the response headers
+        await embedding_limiter.acquire(estimate_tokens(texts))
+        raw_response = await async_client.embeddings.with_raw_response.create(
+            model=EMBEDDING_MODEL,
+            input=texts
+        )
+        embedding_limiter.update_from_headers(raw_response.headers)
+        response = raw_response.parse()
+        
+        return [item.embedding for item in response.data]
+        
+    except openai.OpenAIError as e:
+        logger.error(f"OpenAI embedding error: {str(e)}")
+        raise OpenAIServiceError(f"Failed to generate embeddings: {str(e)}")
+
+
+@retry(
+    retry=retry_if_exception_type((openai.RateLimitError, openai.APITimeoutError)),
+    wait=wait_exponential(multiplier=1, min=2, max=60),
+    stop=stop_after_attempt(5),
+    before_sleep=lambda retry_state: logger.warning(
+        f"Retrying API call after error: {retry_state.outcome.exception()}. "
+        f"Attempt {retry_state.attempt_number}/{retry_state.retry_state.stop.get_stop_after_attempt()}"
+    )
+)
+async def get_chat_completion_async(
+    messages: List[Dict[str, str]],
+    temperature: float = None,
+    max_tokens: int = None,
+    model: str = None,
+    stream: bool = False
+) -> Union[str, Any]:
+    """
+    Generate a chat completion using the async OpenAI client.
+    
+    Same contract as get_chat_completion, but awaits the request so the event
+    loop can serve other connections while waiting on the API. When streaming,
+    the returned object must be consumed with ``async for``.
+    
+    Args:
+        messages: List of message dictionaries with 'role' and 'content'
+        temperature: Sampling temperature (0.0 to 1.0)
+        max_tokens: Maximum tokens to generate
+        model: Model to use for completion
+        stream: Whether to stream the response
+        
+    Returns:
+        Generated text or async stream response object
+        
+    Raises:
+        OpenAIServiceError: If an error occurs during the API call
+        RateLimitExceededError: If the rate limit is exceeded
+    """
+    try:
+        logger.debug(f"Generating async chat completion with {len(messages)} messages")
+        
+        # Use config values if parameters not provided
+        temperature = temperature if temperature is not None else ai_settings.temperature
+        max_tokens = max_tokens if max_tokens is not None else ai_settings.max_tokens
+        model = model or COMPLETION_MODEL
+        
+        # Check rate limit before proceeding
+        if not rate_limiter.check_rate_limit("completions"):
+            retry_after = rate_limiter.get_retry_after("completions")
+            logger.warning(f"Rate limit exceeded for completions. Retry after {retry_after} seconds.")
+            raise RateLimitExceededError(retry_after)
+        
+        # Wait for pacing budget, then correct it from the response headers.
+        # The completion budget counts max_tokens as well as the prompt.
+        await completion_limiter.acquire(
+            estimate_tokens(message["content"] for message in messages) + max_tokens
+        )
+        raw_response = await async_client.chat.completions.with_raw_response.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=stream
+        )
+        completion_limiter.update_from_headers(raw_response.headers)
+        response = raw_response.parse()
+        
+        if stream:
+            logger.debug("Returning async stream response")
+            return response
+        else:
+            completion_text = response.choices[0].message.content
+            logger.debug(f"Chat completion successful, generated {len(completion_text)} chars")
+            return completion_text
+            
+    except openai.OpenAIError as e:
+        logger.error(f"OpenAI completion error: {str(e)}")
+        raise OpenAIServiceError(f"Failed to generate chat completion: {str(e)}")
+
+
+async def close_async_client() -> None:
+    """Close the shared async HTTP connection pool. Call on application shutdown."""
+    await async_http_client.aclose()
+    logger.info("Closed async OpenAI HTTP client")
+
+
 def moderate_content(text: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
     """
     Check if text violates OpenAI's content policy.
@@ -190,6 +350,12 @@ def moderate_content(text: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
         if not ai_settings.moderation_enabled:
             return False, None
             
+        # Repeated messages reuse the earlier verdict without a network call
+        key = _moderation_key(text)
+        cached = _cached_moderation(key)
+        if cached is not None:
+            return cached
+            
         logger.debug("Moderating content")
         
         # Check rate limit before proceeding
@@ -199,21 +365,93 @@ def moderate_content(text: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
             return False, None
         
         response = client.moderations.create(input=text)
-        result = response.results[0]
-        flagged = result.flagged
-        
-        categories = None
-        if flagged:
-            categories = {
-                category: score
-                for category, score in result.category_scores.items()
-                if getattr(result.categories, category)
-            }
-            logger.warning(f"Content moderation flagged text. Categories: {categories}")
+        return _store_moderation(key, _moderation_verdict(response.results[0]))
+        
+    except openai.OpenAIError as e:
+        logger.error(f"OpenAI moderation error: {str(e)}")
+        # Return True (flagged) to be safe if the moderation API fails
+        return True, None
+
+
+async def moderate_content_async(text: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """
+    Check if text violates OpenAI's content policy using the async OpenAI client.
+    
+    Same contract as moderate_content, without blocking the event loop.
+    
+    Args:
+        text: The text to moderate
+        
+    Returns:
+        Tuple of (flagged: bool, categories: Optional[Dict])
+    """
+    try:
+        if not ai_settings.moderation_enabled:
+            return False, None
             
-        return flagged, categories
+        # Repeated messages reuse the earlier verdict without a network call
+        key = _moderation_key(text)
+        cached = _cached_moderation(key)
+        if cached is not None:
+            return cached
+            
+        logger.debug("Moderating content")
+        
+        # Check rate limit before proceeding
+        if not rate_limiter.check_rate_limit("moderation"):
+            logger.warning("Rate limit exceeded for moderation. Skipping moderation.")
+            # For moderation, we'll skip rather than fail if rate limited
+            return False, None
+        
+        await moderation_limiter.acquire()
+        raw_response = await async_client.moderations.with_raw_response.create(input=text)
+        moderation_limiter.update_from_headers(raw_response.headers)
+        response = raw_response.parse()
+        return _store_moderation(key, _moderation_verdict(response.results[0]))
         
     except openai.OpenAIError as e:
         logger.error(f"OpenAI moderation error: {str(e)}")
         # Return True (flagged) to be safe if the moderation API fails
-        return True, None 
\ No newline at end of file
+        return True, None
+
+
+def _moderation_key(text: str) -> Tuple[int, str]:
+    """Build the moderation cache key from the policy version and a digest of the text."""
+    return MODERATION_POLICY_VERSION, hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def _cached_moderation(key: Tuple[int, str]) -> Optional[Tuple[bool, Optional[Dict[str, Any]]]]:
+    """Return a cached moderation verdict, or None if there is none."""
+    with _moderation_cache_lock:
+        return _moderation_cache.get(key)
+
+
+def _store_moderation(
+    key: Tuple[int, str],
+    verdict: Tuple[bool, Optional[Dict[str, Any]]]
+) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """
+    Cache a moderation verdict from the API and return it.
+    
+    Only real verdicts are stored; the fail-closed result of an API error
+    and the rate-limit skip are never cached.
+    """
+    with _moderation_cache_lock:
+        _moderation_cache[key] = verdict
+    return verdict
+
+
+def _moderation_verdict(result: Any) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """Extract the flag and flagged category scores from a moderation result."""
+    flagged = result.flagged
+    
+    categories = None
+    if flagged:
+        categories = {
+            category: score
+            for category, score in result.category_scores.items()
+            if getattr(result.categories, category)
+        }
+        logger.warning(f"Content moderation flagged text. Categories: {categories}")
+        
+    return flagged, categories 
\ No newline at end of file
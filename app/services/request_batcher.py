@@ -0,0 +1,84 @@
+"""
+Request Batcher Base
+
+This module holds the queue and worker loop for batching requests;
+subclasses decide how a collected batch is dispatched.
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, List, Optional, Set
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class RequestBatcher(ABC):
+    """
+    Drains queued requests into batches and hands each batch to
+    _dispatch_batch without waiting for the previous one to finish.
+
+    Queued items must carry the asyncio.Future their caller is awaiting
+    as a `future` attribute.
+    """
+
+    # Used in log messages
+    kind = "request"
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float):
+        """
+        Initialize the batcher.
+
+        Args:
+            max_batch_size: Maximum number of requests dispatched together
+            max_wait_ms: Maximum time to wait for a batch to fill, in
+                milliseconds; 0 dispatches whatever is already queued
+        """
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+
+    async def _enqueue(self, item: Any) -> Any:
+        """Queue an item and wait for its future to resolve."""
+        self._ensure_worker()
+        await self._queue.put(item)
+        return await item.future
+
+    def _ensure_worker(self) -> None:
+        """Start the worker task on the running loop if it is not running."""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        """Drain the queue into batches and dispatch them."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    # Take what is already queued without waiting for more
+                    while len(batch) < self.max_batch_size and not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            logger.debug(f"Dispatching batch of {len(batch)} {self.kind} requests")
+
+            # Don't block the next batch on this one's API latency
+            dispatched = loop.create_task(self._dispatch_batch(batch))
+            self._in_flight.add(dispatched)
+            dispatched.add_done_callback(self._in_flight.discard)
+
+    @abstractmethod
+    async def _dispatch_batch(self, batch: List[Any]) -> None:
+        """Send a batch and resolve each item's future."""
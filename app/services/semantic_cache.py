@@ -0,0 +1,166 @@
+"""
+Semantic Cache Service
+
+This module caches assistant replies keyed by the embedding of the user's
+message and a hash of the recent conversation turns plus the inputs the
+system prompt is built from, so repeated or paraphrased questions asked in
+the same context skip the completion call.
+"""
+
+import hashlib
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config.ai_settings import ai_settings
+from app.services.openai_service import get_embeddings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def context_hash(recent_turns: List[Dict[str, Any]], prompt_inputs: Sequence[str] = ()) -> str:
+    """
+    Hash the context a reply was generated in into a cache key.
+    
+    Args:
+        recent_turns: Messages with 'role' and 'content', oldest first
+        prompt_inputs: Values the system prompt is built from, such as
+            retrieved documents, customer and product IDs and the summary
+        
+    Returns:
+        Hex digest identifying the conversational context
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for turn in recent_turns:
+        digest.update(turn["role"].encode())
+        digest.update(b"\x00")
+        digest.update(turn["content"].encode())
+        digest.update(b"\x01")
+    digest.update(b"\x02")
+    for value in prompt_inputs:
+        digest.update(value.encode())
+        digest.update(b"\x01")
+    return digest.hexdigest()
+
+
+def _normalize(embedding: List[float]) -> np.ndarray:
+    """Convert an embedding to a unit-length float32 vector."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+@lru_cache(maxsize=256)
+def _embed(message: str) -> np.ndarray:
+    """Embed and normalize a message; memoized so a miss and its store embed once."""
+    return _normalize(get_embeddings([message])[0])
+
+
+class SemanticCache:
+    """
+    Fixed-size ring buffer of (context hash, message embedding, reply) entries.
+    
+    A lookup hits when an unexpired entry with the same context hash has a
+    cosine similarity at or above the threshold; the oldest entries are
+    overwritten once the cache is full.
+    """
+    
+    def __init__(
+        self,
+        threshold: float = None,
+        max_entries: int = None,
+        ttl_seconds: int = None
+    ):
+        """
+        Initialize the semantic cache.
+        
+        Args:
+            threshold: Minimum cosine similarity for a hit
+            max_entries: Number of replies kept
+            ttl_seconds: Lifetime of a cached reply
+        """
+        self.threshold = threshold if threshold is not None else ai_settings.semantic_cache_threshold
+        self.max_entries = max_entries or ai_settings.semantic_cache_size
+        self.ttl_seconds = ttl_seconds or ai_settings.cache_ttl_seconds
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._keys = np.full(self.max_entries, None, dtype=object)
+        self._expires = np.zeros(self.max_entries)
+        self._responses: List[Optional[str]] = [None] * self.max_entries
+        self._next = 0
+        
+    def lookup(
+        self,
+        message: str,
+        chat_context_hash: str,
+        embedding: Optional[List[float]] = None
+    ) -> Optional[str]:
+        """
+        Find a cached reply for a message asked in the given context.
+        
+        Args:
+            message: The user's message
+            chat_context_hash: Hash of the turn's context, from context_hash
+            embedding: Precomputed embedding of the message, if available
+            
+        Returns:
+            The cached reply, or None on a miss or if embedding fails
+        """
+        if self._matrix is None:
+            return None
+        try:
+            query = _embed(message) if embedding is None else _normalize(embedding)
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup skipped: {str(e)}")
+            return None
+            
+        with self._lock:
+            candidates = (self._keys == chat_context_hash) & (self._expires > time.time())
+            if not candidates.any():
+                return None
+            scores = np.where(candidates, self._matrix @ query, -1.0)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            logger.debug(f"Semantic cache hit with similarity {scores[best]:.3f}")
+            return self._responses[best]
+            
+    def store(
+        self,
+        message: str,
+        response: str,
+        chat_context_hash: str,
+        embedding: Optional[List[float]] = None
+    ) -> None:
+        """
+        Cache a reply for a message asked in the given context.
+        
+        Args:
+            message: The user's message
+            response: The assistant's reply
+            chat_context_hash: Hash of the turn's context, from context_hash
+            embedding: Precomputed embedding of the message, if available
+        """
+        try:
+            embedding = _embed(message) if embedding is None else _normalize(embedding)
+        except Exception as e:
+            logger.warning(f"Semantic cache store skipped: {str(e)}")
+            return
+            
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, embedding.shape[0]), dtype=np.float32)
+            slot = self._next
+            self._matrix[slot] = embedding
+            self._keys[slot] = chat_context_hash
+            self._expires[slot] = time.time() + self.ttl_seconds
+            self._responses[slot] = response
+            self._next = (slot + 1) % self.max_entries
+
+
+# Create a global semantic cache instance
+semantic_cache = SemanticCache()
@@ -0,0 +1,148 @@
+"""
+Session Store Service
+
+This module keeps the ConversationManager for each active conversation in a
+bounded in-process cache. Conversations are evicted after sitting idle for
+the configured TTL, or least recently used first once the cache is full.
+"""
+
+import asyncio
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from cachetools import TTLCache
+
+from app.config.settings import settings
+from app.services.conversation_manager import ConversationManager
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _lock_in_use(lock: asyncio.Lock) -> bool:
+    """Check whether a turn holds the lock or is waiting for it."""
+    # locked() is briefly False while a release hands the lock to a waiter
+    return lock.locked() or bool(getattr(lock, "_waiters", None))
+
+
+class SessionStore:
+    """LRU cache of conversation managers with idle-TTL eviction."""
+    
+    def __init__(self, maxsize: int = None, ttl: float = None):
+        """
+        Initialize the session store.
+        
+        Args:
+            maxsize: Maximum number of conversations kept
+            ttl: Seconds a conversation may sit idle before it is evicted
+        """
+        self._cache: TTLCache = TTLCache(
+            maxsize=maxsize or settings.SESSION_MAX_CONVERSATIONS,
+            ttl=ttl or settings.SESSION_TTL_SECONDS
+        )
+        self._lock = asyncio.Lock()
+        self._turn_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        
+    def __len__(self) -> int:
+        return len(self._cache)
+        
+    def __contains__(self, conversation_id: str) -> bool:
+        return conversation_id in self._cache
+        
+    def keys(self) -> List[str]:
+        """Get the IDs of the stored conversations."""
+        return list(self._cache.keys())
+        
+    async def get(self, conversation_id: str) -> Optional[ConversationManager]:
+        """
+        Get the manager for a conversation, refreshing its idle timer.
+        
+        Args:
+            conversation_id: The conversation identifier
+            
+        Returns:
+            The conversation manager, or None if it is not stored
+        """
+        async with self._lock:
+            manager = self._cache.get(conversation_id)
+            if manager is not None:
+                # Re-inserting restarts the TTL, so it measures idle time
+                self._cache[conversation_id] = manager
+            return manager
+            
+    async def set(self, conversation_id: str, manager: ConversationManager) -> None:
+        """
+        Store the manager for a conversation.
+        
+        Args:
+            conversation_id: The conversation identifier
+            manager: The conversation manager
+        """
+        async with self._lock:
+            self._cache[conversation_id] = manager
+            
+    async def pop(self, conversation_id: str) -> Optional[ConversationManager]:
+        """
+        Remove a conversation from the store.
+        
+        Its turn lock is dropped too unless a turn holds or awaits it, so
+        that turn stays serialized with any that follow; expire drops the
+        lock once it is free.
+        
+        Args:
+            conversation_id: The conversation identifier
+            
+        Returns:
+            The removed manager, or None if it was not stored
+        """
+        async with self._lock:
+            lock = self._turn_locks.get(conversation_id)
+            if lock is not None and not _lock_in_use(lock):
+                del self._turn_locks[conversation_id]
+            return self._cache.pop(conversation_id, None)
+            
+    def turn_lock(self, conversation_id: str) -> asyncio.Lock:
+        """
+        Get the lock that serializes turns for a conversation.
+        
+        Args:
+            conversation_id: The conversation identifier
+            
+        Returns:
+            The conversation's lock, created on first use
+        """
+        return self._turn_locks[conversation_id]
+        
+    async def expire(self) -> int:
+        """
+        Purge idle conversations and the turn locks of evicted ones.
+        
+        Returns:
+            Number of conversations expired
+        """
+        async with self._lock:
+            expired = self._cache.expire()
+            for conversation_id in [
+                cid for cid, lock in self._turn_locks.items()
+                if cid not in self._cache and not _lock_in_use(lock)
+            ]:
+                del self._turn_locks[conversation_id]
+        return len(expired)
+        
+    async def run_expiry(self, interval: float = None) -> None:
+        """
+        Call expire periodically until cancelled.
+        
+        Args:
+            interval: Seconds between purges
+        """
+        interval = interval or settings.SESSION_EXPIRE_INTERVAL_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            expired = await self.expire()
+            if expired:
+                logger.info(f"Expired {expired} idle conversations, {len(self)} active")
+
+
+# Create a global session store instance
+session_store = SessionStore()
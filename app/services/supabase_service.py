@@ -149,7 +149,8 @@ def store_document_chunks(
 def search_similar_chunks(
     query_embedding: List[float],
     limit: int = 5,
-    threshold: float = 0.8
+    threshold: float = 0.8,
+    include_embeddings: bool = False
 ) -> List[Dict[str, Any]]:
     """
     Search for document chunks similar to the query embedding.
@@ -158,6 +159,7 @@ def search_similar_chunks(
         query_embedding: The embedding vector to search for
         limit: Maximum number of results to return
         threshold: Similarity threshold (lower value = more results)
+        include_embeddings: Whether to return each chunk's embedding as well
         
     Returns:
         List of document chunks with similarity scores
@@ -172,7 +174,7 @@ def search_similar_chunks(
         
         # Using the <=> operator for cosine distance
         response = supabase.rpc(
-            "match_document_chunks",
+            "match_document_chunks_with_embeddings" if include_embeddings else "match_document_chunks",
             {
                 "query_embedding": query_embedding,
                 "match_threshold": threshold,
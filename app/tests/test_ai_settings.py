@@ -0,0 +1,28 @@
+"""
+Tests for the AI settings
+"""
+
+import os
+import sys
+import unittest
+
+from pydantic import ValidationError
+
+# Set up path for importing app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.config.ai_settings import AISettings
+
+
+class TestAISettings(unittest.TestCase):
+    """Tests for AISettings"""
+
+    def test_window_must_fit_history(self):
+        """Test that a sliding window larger than the kept history is rejected"""
+        AISettings(sliding_window_turns=5, max_conversation_messages=10)
+        with self.assertRaises(ValidationError):
+            AISettings(sliding_window_turns=6, max_conversation_messages=10)
+
+
+if __name__ == "__main__":
+    unittest.main()
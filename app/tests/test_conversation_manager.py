@@ -2,10 +2,12 @@
 Tests for the conversation management functionality
 """
 
+import asyncio
 import os
 import sys
 import unittest
-from unittest.mock import patch, MagicMock
+import uuid
+from unittest.mock import patch, MagicMock, AsyncMock
 import logging
 
 # Set up path for importing app modules
@@ -15,7 +17,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../.
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from app.services.conversation_manager import ConversationManager, Message
+from app.services.conversation_manager import ConversationManager, Message, new_conversation_id, should_retrieve, trim_context
 
 
 class TestConversationManager(unittest.TestCase):
@@ -114,11 +116,41 @@ class TestConversationManager(unittest.TestCase):
         self.assertIn("timestamp", limited_history[0])
         self.assertIn("metadata", limited_history[0])
     
-    @patch('app.services.conversation_manager.search_and_format_query')
-    def test_retrieve_relevant_context(self, mock_search):
+    def test_get_messages_since(self):
+        """Test retrieving only the messages after a given message ID"""
+        conversation_id = self.manager.create_conversation()
+        
+        for i in range(6):
+            role = "user" if i % 2 == 0 else "assistant"
+            self.manager.add_message(conversation_id, role, f"Message {i}")
+        
+        # Everything by default
+        self.assertEqual(len(self.manager.get_messages_since(conversation_id)), 6)
+        
+        # Only messages after ID 3
+        delta = self.manager.get_messages_since(conversation_id, since=3)
+        self.assertEqual([msg["id"] for msg in delta], [4, 5])
+        self.assertEqual(delta[0]["content"], "Message 4")
+        
+        # Nothing new
+        self.assertEqual(self.manager.get_messages_since(conversation_id, since=5), [])
+        
+        # Test invalid conversation ID
+        with self.assertRaises(ValueError):
+            self.manager.get_messages_since("invalid_id")
+    
+    @patch('app.services.conversation_manager.retrieve_relevant_chunks')
+    @patch('app.services.conversation_manager.get_embeddings')
+    def test_retrieve_relevant_context(self, mock_embeddings, mock_retrieve):
         """Test retrieving relevant context for a query"""
-        # Mock search result
-        mock_search.return_value = "Mocked relevant document context"
+        # Mock query embedding and index results
+        mock_embeddings.return_value = [[1.0, 0.0]]
+        mock_retrieve.return_value = [
+            {"content": "Use the reset link.", "document_id": "doc1",
+             "metadata": {"title": "Password Guide"}, "embedding": "[1.0,0.0]"},
+            {"content": "Unrelated shipping info.", "document_id": "doc2",
+             "metadata": {}, "embedding": "[0.0,1.0]"}
+        ]
         
         # Create conversation
         conversation_id = self.manager.create_conversation(product_id="prod123")
@@ -129,18 +161,42 @@ class TestConversationManager(unittest.TestCase):
             query="How do I reset my password?"
         )
         
-        # Check result
-        self.assertEqual(result, "Mocked relevant document context")
+        # Check result only includes the chunk above the threshold
+        self.assertIn("Use the reset link.", result)
+        self.assertIn("Password Guide", result)
+        self.assertNotIn("shipping", result)
         
-        # Verify search was called with correct parameters
-        mock_search.assert_called_once()
-        args, kwargs = mock_search.call_args
+        # Verify the index was queried for a wide candidate set
+        mock_retrieve.assert_called_once()
+        args, kwargs = mock_retrieve.call_args
         self.assertEqual(kwargs["query"], "How do I reset my password?")
         self.assertEqual(kwargs["filters"], {"product_id": "prod123"})
+        self.assertTrue(kwargs["include_embeddings"])
         
         # Check conversation context was updated
         context = self.manager.active_conversations[conversation_id]
-        self.assertEqual(context.relevant_docs, "Mocked relevant document context")
+        self.assertEqual(context.relevant_docs, result)
+        
+    @patch('app.services.conversation_manager.retrieve_relevant_chunks')
+    @patch('app.services.conversation_manager.get_embeddings')
+    def test_retrieve_relevant_context_warm_cache(self, mock_embeddings, mock_retrieve):
+        """Test that follow-up queries are answered from the warm cache"""
+        mock_embeddings.return_value = [[1.0, 0.0]]
+        mock_retrieve.return_value = [
+            {"content": "Use the reset link.", "document_id": "doc1",
+             "metadata": {}, "embedding": [1.0, 0.0]}
+        ]
+        conversation_id = self.manager.create_conversation()
+        
+        self.manager.retrieve_relevant_context(conversation_id, "How do I reset my password?", prefetch=True)
+        self.manager.retrieve_relevant_context(conversation_id, "Where is the reset link?")
+        self.assertEqual(mock_retrieve.call_count, 1)
+        
+        # A query with nothing close in the cache goes back to the index
+        mock_embeddings.return_value = [[0.0, 1.0]]
+        result = self.manager.retrieve_relevant_context(conversation_id, "When will my order ship?")
+        self.assertEqual(mock_retrieve.call_count, 2)
+        self.assertEqual(result, "")
     
     def test_get_chat_context(self):
         """Test getting formatted chat context"""
@@ -156,8 +212,14 @@ class TestConversationManager(unittest.TestCase):
         self.manager.add_message(conversation_id, "user", "I need help with my account")
         
         # Update context with relevant docs
-        with patch('app.services.conversation_manager.search_and_format_query') as mock_search:
-            mock_search.return_value = "Relevant info about account management"
+        with patch('app.services.conversation_manager.get_embeddings') as mock_embeddings, \
+                patch('app.services.conversation_manager.retrieve_relevant_chunks') as mock_retrieve:
+            mock_embeddings.return_value = [[1.0, 0.0]]
+            mock_retrieve.return_value = [{
+                "content": "Relevant info about account management",
+                "document_id": "doc1",
+                "embedding": [1.0, 0.0]
+            }]
             self.manager.retrieve_relevant_context(
                 conversation_id=conversation_id,
                 query="I need help with my account"
@@ -177,6 +239,80 @@ class TestConversationManager(unittest.TestCase):
         self.assertIn("customer ID: cust123", chat_context[0]["content"])
         self.assertIn("product: prod456", chat_context[0]["content"])
     
+    def test_chat_context_window(self):
+        """Test that the chat context keeps only the last max_conversation_length messages"""
+        conversation_id = self.manager.create_conversation()
+        for i in range(7):
+            self.manager.add_message(conversation_id, "user", f"message {i}")
+        
+        chat_context = self.manager.get_chat_context(conversation_id)
+        
+        self.assertEqual(len(chat_context), 6)  # system + 5 messages
+        self.assertEqual([m["content"] for m in chat_context[1:]], [f"message {i}" for i in range(2, 7)])
+        self.assertEqual(len(self.manager.get_conversation_history(conversation_id)), 7)
+    
+    def test_prepare_turn(self):
+        """Test that prepare_turn matches the separate add/context/trim calls"""
+        conversation_id = self.manager.create_conversation(customer_id="cust123")
+        for i in range(4):
+            self.manager.add_message(conversation_id, "user", f"question {i}")
+            self.manager.add_message(conversation_id, "assistant", f"answer {i}")
+        self.manager.active_conversations[conversation_id].summary = "Earlier turns"
+        
+        chat_context = self.manager.prepare_turn(conversation_id, "new question", max_turns=2)
+        expected = trim_context(
+            self.manager.get_chat_context(conversation_id),
+            max_turns=2,
+            summary="Earlier turns"
+        )
+        
+        self.assertEqual(chat_context, expected)
+        self.assertEqual(chat_context[-1], {"role": "user", "content": "new question"})
+        self.assertEqual(len(self.manager.get_conversation_history(conversation_id)), 9)
+        
+        with self.assertRaises(ValueError):
+            self.manager.prepare_turn("invalid_id", "hello", max_turns=2)
+    
+    def test_get_prompt_inputs(self):
+        """Test that prompt inputs reflect ids, retrieved documents and summary"""
+        conversation_id = self.manager.create_conversation(customer_id="cust123", product_id="prod456")
+        self.assertEqual(self.manager.get_prompt_inputs(conversation_id), ("cust123", "prod456", "", ""))
+        
+        context = self.manager.active_conversations[conversation_id]
+        context.relevant_docs = "Warranty lasts one year."
+        context.summary = "Earlier turns"
+        self.assertEqual(
+            self.manager.get_prompt_inputs(conversation_id),
+            ("cust123", "prod456", "Warranty lasts one year.", "Earlier turns")
+        )
+        
+        with self.assertRaises(ValueError):
+            self.manager.get_prompt_inputs("invalid_id")
+    
+    @patch('app.services.conversation_manager.get_chat_completion_async', new_callable=AsyncMock)
+    def test_refresh_summary(self, mock_completion):
+        """Test folding messages outside the window into the summary"""
+        mock_completion.return_value = "Customer cannot log in."
+        conversation_id = self.manager.create_conversation()
+        
+        for i in range(6):
+            self.manager.add_message(conversation_id, "user" if i % 2 == 0 else "assistant", f"Message {i}")
+            
+        # Two messages outside a four message window, below the threshold of four
+        self.assertFalse(self.manager.summary_due(conversation_id, window_messages=4, refresh_every=4))
+        self.assertTrue(self.manager.summary_due(conversation_id, window_messages=4, refresh_every=2))
+        
+        summary = asyncio.run(self.manager.refresh_summary(conversation_id, window_messages=4))
+        self.assertEqual(summary, "Customer cannot log in.")
+        self.assertEqual(self.manager.active_conversations[conversation_id].summary, summary)
+        self.assertIn("Message 1", mock_completion.call_args[1]["messages"][1]["content"])
+        self.assertNotIn("Message 2", mock_completion.call_args[1]["messages"][1]["content"])
+        
+        # Nothing new has left the window, so no further call is made
+        asyncio.run(self.manager.refresh_summary(conversation_id, window_messages=4))
+        self.assertEqual(mock_completion.call_count, 1)
+        self.assertFalse(self.manager.summary_due(conversation_id, window_messages=4, refresh_every=1))
+        
     @patch('app.services.conversation_manager.store_document')
     def test_end_conversation(self, mock_store):
         """Test ending and archiving a conversation"""
@@ -232,5 +368,69 @@ class TestConversationManager(unittest.TestCase):
         self.assertNotIn(conversation_id, self.manager.active_conversations)
 
 
+
+class TestShouldRetrieve(unittest.TestCase):
+    """Tests for the retrieval gate"""
+    
+    def test_skips_conversational_messages(self):
+        """Test that fillers, short and emoji-only messages skip retrieval"""
+        self.assertFalse(should_retrieve("ok", []))
+        self.assertFalse(should_retrieve("Thank you!!", []))
+        self.assertFalse(should_retrieve("👍👍👍👍👍👍👍👍👍👍", []))
+        
+    def test_skips_repeated_question(self):
+        """Test that repeating a recent user question skips retrieval"""
+        recent_turns = [
+            {"role": "user", "content": "How do I reset my password?"},
+            {"role": "assistant", "content": "Use the 'Forgot Password' link."}
+        ]
+        self.assertFalse(should_retrieve("how do I reset my password?", recent_turns))
+        
+    def test_retrieves_for_questions(self):
+        """Test that a new question triggers retrieval"""
+        self.assertTrue(should_retrieve("How do I reset my password?", []))
+
+
+class TestNewConversationId(unittest.TestCase):
+    """Tests for batched conversation ID generation"""
+    
+    def test_ids_are_unique_uuid4(self):
+        """Test that IDs from across batch refills are distinct version 4 UUIDs"""
+        ids = [new_conversation_id() for _ in range(600)]
+        
+        self.assertEqual(len(set(ids)), 600)
+        for conversation_id in ids:
+            self.assertEqual(uuid.UUID(conversation_id).version, 4)
+
+
+class TestTrimContext(unittest.TestCase):
+    """Tests for the context sliding window"""
+    
+    def setUp(self):
+        """Set up a context with a system prompt and five turns"""
+        self.chat_context = [{"role": "system", "content": "System prompt"}]
+        for i in range(5):
+            self.chat_context.append({"role": "user", "content": f"Question {i}"})
+            self.chat_context.append({"role": "assistant", "content": f"Answer {i}"})
+            
+    def test_keeps_recent_turns(self):
+        """Test that only the last turns are kept after the system prompt"""
+        trimmed = trim_context(self.chat_context, max_turns=2)
+        
+        self.assertEqual(len(trimmed), 5)
+        self.assertEqual(trimmed[0]["content"], "System prompt")
+        self.assertEqual(trimmed[1]["content"], "Question 3")
+        self.assertEqual(trimmed[-1]["content"], "Answer 4")
+        
+    def test_adds_summary(self):
+        """Test that the summary follows the system prompt"""
+        trimmed = trim_context(self.chat_context, max_turns=1, summary="Earlier discussion")
+        
+        self.assertEqual(len(trimmed), 4)
+        self.assertEqual(trimmed[1]["role"], "system")
+        self.assertIn("Earlier discussion", trimmed[1]["content"])
+        self.assertEqual(trimmed[2]["content"], "Question 4")
+
+
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,50 @@
+"""
+Tests for the message fast-exit classifier
+"""
+
+import os
+import sys
+import unittest
+
+# Set up path for importing app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.config.ai_settings import ai_settings
+from app.services import mfee
+from app.services.mfee import classify
+
+
+class TestClassify(unittest.TestCase):
+    """Tests for classify"""
+    
+    def test_invalid_for_unusable_messages(self):
+        """Test that empty, oversized and binary messages are rejected as invalid"""
+        self.assertEqual(classify(""), "INVALID")
+        self.assertEqual(classify("   \n"), "INVALID")
+        self.assertEqual(classify("a" * (ai_settings.max_message_length + 1)), "INVALID")
+        self.assertEqual(classify("hello\x00world"), "INVALID")
+        self.assertEqual(classify("\x01\x02\x03\x04 abc"), "INVALID")
+        
+    def test_direct_for_blocklisted_messages(self):
+        """Test that configured blocklist patterns are refused directly"""
+        settings = ai_settings.model_copy(update={"moderation_blocklist": [r"\bforbidden\b"]})
+        mfee._compile_rules(settings)
+        try:
+            self.assertEqual(classify("This is FORBIDDEN content"), "DIRECT")
+            self.assertEqual(classify("This is fine content"), "MODERATE")
+        finally:
+            mfee._compile_rules(ai_settings)
+            
+    def test_render_for_acknowledgements(self):
+        """Test that plain acknowledgements skip moderation"""
+        self.assertEqual(classify("Thanks!"), "RENDER")
+        self.assertEqual(classify("ok"), "RENDER")
+        
+    def test_moderate_for_questions(self):
+        """Test that regular messages still go through moderation"""
+        self.assertEqual(classify("How do I reset my password?"), "MODERATE")
+        self.assertEqual(classify("Wie setze ich mein Passwort zurück? 🙂\n"), "MODERATE")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+Tests for the OpenAI request pacing limiter
+"""
+
+import os
+import sys
+import unittest
+
+# Set up path for importing app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.openai_limiter import OpenAILimiter, estimate_tokens
+
+
+class TestOpenAILimiter(unittest.IsolatedAsyncioTestCase):
+    """Tests for OpenAILimiter"""
+    
+    async def test_waits_for_request_budget(self):
+        """Test that requests past the budget wait for the bucket to refill"""
+        limiter = OpenAILimiter(requests_per_minute=600)  # 10 per second
+        limiter._available_requests = 0
+        
+        start = limiter._last_refill
+        await limiter.acquire()
+        self.assertGreaterEqual(limiter._last_refill - start, 0.09)
+        
+    async def test_waits_for_token_budget(self):
+        """Test that large requests wait for enough tokens"""
+        limiter = OpenAILimiter(requests_per_minute=600, tokens_per_minute=600)
+        await limiter.acquire(590)
+        
+        start = limiter._last_refill
+        await limiter.acquire(15)  # needs ~5 more tokens at 10 per second
+        self.assertGreaterEqual(limiter._last_refill - start, 0.4)
+        
+    def test_update_from_headers(self):
+        """Test that response headers correct limits and remaining budget"""
+        limiter = OpenAILimiter(requests_per_minute=500, tokens_per_minute=30000)
+        limiter.update_from_headers({
+            "x-ratelimit-limit-requests": "1000",
+            "x-ratelimit-remaining-requests": "12",
+            "x-ratelimit-limit-tokens": "50000",
+            "x-ratelimit-remaining-tokens": "abc"
+        })
+        
+        self.assertEqual(limiter.requests_per_minute, 1000)
+        self.assertEqual(limiter._available_requests, 12)
+        self.assertEqual(limiter.tokens_per_minute, 50000)
+        
+    def test_estimate_tokens(self):
+        """Test the character based token estimate"""
+        self.assertEqual(estimate_tokens(["a" * 40, "b" * 40]), 20)
+        self.assertEqual(estimate_tokens([""]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Tests for the semantic response cache
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Set up path for importing app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services import semantic_cache as semantic_cache_module
+from app.services.semantic_cache import SemanticCache, context_hash
+
+EMBEDDINGS = {
+    "How do I reset my password?": [1.0, 0.0, 0.0],
+    "how can I reset my password": [0.99, 0.1, 0.0],
+    "When will my order ship?": [0.0, 1.0, 0.0],
+}
+
+
+class TestSemanticCache(unittest.TestCase):
+    """Tests for SemanticCache"""
+    
+    def setUp(self):
+        """Set up a small cache with deterministic embeddings"""
+        semantic_cache_module._embed.cache_clear()
+        patcher = patch(
+            'app.services.semantic_cache.get_embeddings',
+            side_effect=lambda texts: [EMBEDDINGS[text] for text in texts]
+        )
+        self.mock_embeddings = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(semantic_cache_module._embed.cache_clear)
+        self.cache = SemanticCache(threshold=0.95, max_entries=2, ttl_seconds=60)
+        self.key = context_hash([])
+        
+    def test_hit_for_paraphrase_in_same_context(self):
+        """Test that a close paraphrase returns the cached reply"""
+        self.assertIsNone(self.cache.lookup("How do I reset my password?", self.key))
+        self.cache.store("How do I reset my password?", "Use the reset link.", self.key)
+        
+        self.assertEqual(self.cache.lookup("how can I reset my password", self.key), "Use the reset link.")
+        self.assertIsNone(self.cache.lookup("When will my order ship?", self.key))
+        
+        # The miss and the store share one embedding call
+        self.assertEqual(self.mock_embeddings.call_count, 3)
+        
+    def test_miss_for_different_context(self):
+        """Test that the same question in another context is not a hit"""
+        self.cache.store("How do I reset my password?", "Use the reset link.", self.key)
+        other_key = context_hash([{"role": "user", "content": "Hi"}])
+        
+        self.assertNotEqual(other_key, self.key)
+        self.assertIsNone(self.cache.lookup("How do I reset my password?", other_key))
+        
+    def test_miss_for_different_prompt_inputs(self):
+        """Test that the same turns grounded in other documents or ids are not a hit"""
+        key = context_hash([], ("cust1", "prod1", "Doc A", ""))
+        self.cache.store("How do I reset my password?", "Use the reset link.", key)
+        
+        self.assertEqual(self.cache.lookup("How do I reset my password?", key), "Use the reset link.")
+        for other in (("cust1", "prod1", "Doc B", ""), ("cust2", "prod1", "Doc A", ""), ()):
+            self.assertIsNone(self.cache.lookup("How do I reset my password?", context_hash([], other)))
+        
+    def test_precomputed_embedding_skips_embedding_call(self):
+        """Test that a supplied embedding is used instead of embedding again"""
+        self.cache.store("How do I reset my password?", "Use the reset link.", self.key, [2.0, 0.0, 0.0])
+        
+        self.assertEqual(
+            self.cache.lookup("how can I reset my password", self.key, [0.99, 0.1, 0.0]),
+            "Use the reset link."
+        )
+        self.mock_embeddings.assert_not_called()
+        
+    def test_oldest_entry_evicted(self):
+        """Test that storing past capacity overwrites the oldest reply"""
+        self.cache.store("How do I reset my password?", "Use the reset link.", self.key)
+        self.cache.store("When will my order ship?", "Within two days.", self.key)
+        self.cache.store("how can I reset my password", "Click 'Forgot Password'.", self.key)
+        
+        self.assertEqual(self.cache.lookup("How do I reset my password?", self.key), "Click 'Forgot Password'.")
+        self.assertEqual(self.cache.lookup("When will my order ship?", self.key), "Within two days.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+Tests for the conversation session store
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+# Set up path for importing app modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.conversation_manager import ConversationManager
+from app.services.session_store import SessionStore
+
+
+class TestSessionStore(unittest.IsolatedAsyncioTestCase):
+    """Tests for SessionStore"""
+    
+    async def test_set_get_pop(self):
+        """Test storing, reading and removing a conversation"""
+        store = SessionStore(maxsize=10, ttl=60)
+        manager = ConversationManager()
+        
+        await store.set("conv1", manager)
+        self.assertIs(await store.get("conv1"), manager)
+        self.assertIn("conv1", store)
+        
+        self.assertIs(await store.pop("conv1"), manager)
+        self.assertIsNone(await store.get("conv1"))
+        
+    async def test_pop_keeps_lock_held_by_a_turn(self):
+        """Test that removing a conversation mid-turn keeps its turn lock"""
+        store = SessionStore(maxsize=10, ttl=60)
+        await store.set("conv1", ConversationManager())
+        lock = store.turn_lock("conv1")
+        
+        async with lock:
+            await store.pop("conv1")
+            self.assertIs(store.turn_lock("conv1"), lock)
+            
+        self.assertEqual(await store.expire(), 0)
+        self.assertNotIn("conv1", store._turn_locks)
+        
+    async def test_evicts_least_recently_used(self):
+        """Test that the oldest conversation is evicted once full"""
+        store = SessionStore(maxsize=2, ttl=60)
+        await store.set("conv1", ConversationManager())
+        await store.set("conv2", ConversationManager())
+        await store.get("conv1")
+        await store.set("conv3", ConversationManager())
+        
+        self.assertEqual(sorted(store.keys()), ["conv1", "conv3"])
+        
+    async def test_expire_drops_idle_conversations_and_locks(self):
+        """Test that expire purges idle conversations and their turn locks"""
+        store = SessionStore(maxsize=10, ttl=0.05)
+        await store.set("conv1", ConversationManager())
+        store.turn_lock("conv1")
+        
+        await asyncio.sleep(0.1)
+        self.assertEqual(await store.expire(), 1)
+        self.assertEqual(len(store), 0)
+        self.assertNotIn("conv1", store._turn_locks)
+
+
+if __name__ == "__main__":
+    unittest.main()
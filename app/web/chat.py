@@ -1,62 +1,209 @@
-from fastapi import APIRouter, Request, Depends, HTTPException, Form, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Request, Depends, HTTPException, Form, Query, WebSocket, WebSocketDisconnect
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
-from typing import Dict, List, Optional
-import json
-import uuid
+from starlette.websockets import WebSocketState
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import contextlib
+import os
+import orjson
+import msgpack
 import logfire
 from pathlib import Path
 
-from app.services.conversation_manager import ConversationManager
-from app.services.openai_service import get_chat_completion, moderate_content, OpenAIServiceError, RateLimitExceededError
+from app.services.conversation_manager import ConversationManager, new_conversation_id, should_retrieve
+from app.services.embedding_batcher import embedding_batcher
+from app.services.mfee import classify
+from app.services.semantic_cache import semantic_cache, context_hash
+from app.services.session_store import session_store
+from app.services.openai_service import get_chat_completion_async, moderate_content_async, OpenAIServiceError, RateLimitExceededError
 from app.config.ai_settings import ai_settings
+from app.config.settings import settings as app_settings
 
-# Set up templates
+# Set up templates, compiling the chat pages once at import
 templates = Jinja2Templates(directory=str(Path("app/templates")))
+_INDEX_TEMPLATE = templates.get_template("chat/index.html")
+_HISTORY_TEMPLATE = templates.get_template("chat/history.html")
 
 router = APIRouter()
 
-# Store active conversation managers
-active_conversations: Dict[str, ConversationManager] = {}
+# Coalesce streamed tokens into fewer websocket frames
+STREAM_FLUSH_INTERVAL = 0.015  # seconds
+STREAM_FLUSH_CHARS = 64
 
-def get_conversation_manager(conversation_id: Optional[str] = None) -> ConversationManager:
+# Websocket subprotocol for msgpack frames; stream frames use short keys
+# ({"t": "s", "c": text}) and omit the conversation ID, which is sent once
+# in connection_established. Clients that don't request it get JSON.
+MSGPACK_SUBPROTOCOL = "chat.msgpack.v1"
+
+# Recent messages checked when deciding whether a turn needs retrieval
+RECENT_TURNS = 4
+
+# Debug events are only built when debug logging is configured
+_DEBUG_LOGS = app_settings.LOG.LEVEL.upper() == "DEBUG"
+
+# Fixed replies, built once instead of per request
+_REFUSAL = "I'm sorry, but I cannot respond to this message as it may contain harmful content."
+_INVALID_MSG = "Your message is empty, too long or not valid text. Please check it and try again."
+_RATE_LIMIT_MSG = "The system is currently experiencing high demand. Please try again in a moment."
+_AI_UNAVAILABLE_FMT = "The AI service is currently unavailable: {}".format
+
+# Development mode without a model: echo a placeholder reply and skip
+# retrieval, context building and completion entirely
+PLACEHOLDER_MODE = os.getenv("SUPPORT_AGENT_PLACEHOLDER") == "1"
+_PLACEHOLDER_FMT = "I received your message: '{}'. This is a placeholder response.".format
+
+async def _record_turn(conversation_manager: ConversationManager, conversation_id: str, message: str, ai_response: str) -> str:
+    """Record a turn whose reply was produced without a completion call."""
+    await asyncio.to_thread(conversation_manager.add_message, conversation_id, "user", message)
+    await asyncio.to_thread(conversation_manager.add_message, conversation_id, "assistant", ai_response)
+    return ai_response
+
+# Settings read on every turn, copied once at import so handlers skip the
+# pydantic attribute lookups
+_MOD_ON = ai_settings.moderation_enabled
+_TEMP = ai_settings.temperature
+_MAX_TOK = ai_settings.max_tokens
+_MODEL = ai_settings.model
+_STREAM_ON = ai_settings.stream_enabled
+_MAX_MESSAGES = ai_settings.max_conversation_messages
+_WINDOW_TURNS = ai_settings.sliding_window_turns
+_SUMMARY_EVERY = ai_settings.summary_refresh_turns
+_CACHE_ON = ai_settings.enable_caching
+
+# Completion parameters are shared by every turn rather than rebuilt per
+# request; each call only unpacks them
+_COMPLETION_PARAMS: Dict[str, Any] = {"temperature": _TEMP, "max_tokens": _MAX_TOK, "model": _MODEL}
+_STREAM_PARAMS: Dict[str, Any] = {**_COMPLETION_PARAMS, "stream": True}
+
+async def _cached_reply(
+    conversation_manager: ConversationManager,
+    conversation_id: str,
+    message: str,
+    recent_turns: List[Dict[str, Any]],
+    query_embedding: Optional[List[float]]
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Look up a cached reply for this turn; returns the reply (or None) and the cache key to store under.
+    
+    The key covers the recent turns and what the system prompt is built from
+    (retrieved documents, customer and product, summary), so this must run
+    after moderation and retrieval for the turn.
+    """
+    if not _CACHE_ON or query_embedding is None:
+        return None, None
+    # In-memory field reads; cheap enough to run on the event loop
+    cache_key = context_hash(recent_turns, conversation_manager.get_prompt_inputs(conversation_id))
+    return await asyncio.to_thread(semantic_cache.lookup, message, cache_key, query_embedding), cache_key
+
+async def _moderate(message: str, verdict: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """Run moderation when the classifier could not decide."""
+    if verdict != "MODERATE" or not _MOD_ON:
+        return False, None
+    return await moderate_content_async(message)
+
+async def _embed_and_retrieve(
+    conversation_manager: ConversationManager,
+    conversation_id: str,
+    message: str,
+    retrieve: bool,
+    prefetch: bool
+) -> Optional[List[float]]:
+    """
+    Embed the message once through the shared batcher for both retrieval and
+    the semantic cache, then search in a worker thread if the turn needs it.
+    
+    Returns the embedding, or None when neither needs one.
+    """
+    if not retrieve and not _CACHE_ON:
+        return None
+    try:
+        query_embedding = await embedding_batcher.embed(message)
+    except Exception as e:
+        if retrieve:
+            raise
+        # Only the cache needed it; answer without the cache
+        logfire.warning("Semantic cache skipped", conversation_id=conversation_id, error=str(e))
+        return None
+    if retrieve:
+        await asyncio.to_thread(
+            conversation_manager.retrieve_relevant_context,
+            conversation_id,
+            message,
+            limit=5,  # Could be configurable
+            threshold=0.7,  # Could be configurable
+            prefetch=prefetch,
+            query_embedding=query_embedding
+        )
+    return query_embedding
+
+# Background summary refreshes, keyed by conversation so only one runs at a time
+_summary_tasks: Dict[str, asyncio.Task] = {}
+
+def _schedule_summary_refresh(conversation_manager: ConversationManager, conversation_id: str) -> None:
+    """Fold turns that left the context window into the summary, off the request path."""
+    running = _summary_tasks.get(conversation_id)
+    if running is not None and not running.done():
+        return
+    
+    window_messages = _WINDOW_TURNS * 2
+    if not conversation_manager.summary_due(conversation_id, window_messages, _SUMMARY_EVERY * 2):
+        return
+    
+    task = asyncio.create_task(conversation_manager.refresh_summary(conversation_id, window_messages))
+    _summary_tasks[conversation_id] = task
+    
+    def _done(finished: asyncio.Task) -> None:
+        if _summary_tasks.get(conversation_id) is finished:
+            del _summary_tasks[conversation_id]
+        if not finished.cancelled() and finished.exception() is not None:
+            logfire.warning("Summary refresh failed",
+                           conversation_id=conversation_id,
+                           error=str(finished.exception()))
+    
+    task.add_done_callback(_done)
+
+async def get_conversation_manager(conversation_id: Optional[str] = None) -> ConversationManager:
     """Dependency for ConversationManager."""
     try:
-        # Log conversation ID for debugging
-        logfire.debug("get_conversation_manager called", 
-                     conversation_id=conversation_id, 
-                     active_conversations_count=len(active_conversations),
-                     active_conversation_ids=list(active_conversations.keys()))
+        if _DEBUG_LOGS:
+            logfire.debug("get_conversation_manager called", 
+                         conversation_id=conversation_id, 
+                         active_conversations_count=len(session_store),
+                         active_conversation_ids=session_store.keys())
+        
+        manager = await session_store.get(conversation_id) if conversation_id else None
         
         # Create new conversation if not provided
-        if not conversation_id or conversation_id not in active_conversations:
-            manager = ConversationManager(max_conversation_length=ai_settings.max_conversation_messages)
+        if manager is None:
+            manager = ConversationManager(max_conversation_length=_MAX_MESSAGES)
             if not conversation_id:
                 conversation_id = manager.create_conversation()
                 logfire.info("Created new conversation", new_conversation_id=conversation_id)
             else:
                 logfire.info("Initializing manager for existing conversation ID", conversation_id=conversation_id)
-            active_conversations[conversation_id] = manager
+            await session_store.set(conversation_id, manager)
         
-        return active_conversations[conversation_id]
+        return manager
     except Exception as e:
         logfire.error("Error in get_conversation_manager", 
                      error=str(e), 
                      conversation_id=conversation_id,
-                     active_conversations=list(active_conversations.keys()))
+                     active_conversations_count=len(session_store))
         raise HTTPException(status_code=500, detail=f"Conversation manager unavailable: {str(e)}")
 
 @router.get("/", response_class=HTMLResponse)
-async def chat_home(request: Request):
-    """Chat interface home page."""
-    conversation_id = str(uuid.uuid4())
-    logfire.info("Generating chat home page with new conversation", 
-                conversation_id=conversation_id,
-                client_ip=request.client.host)
-    return templates.TemplateResponse(
-        "chat/index.html", 
-        {"request": request, "conversation_id": conversation_id}
-    )
+async def chat_home(
+    request: Request,
+    conversation_id: Optional[str] = Query(None, pattern=r"^[A-Za-z0-9-]{1,64}$")
+):
+    """Chat interface home page, resuming the given conversation if one is passed."""
+    if conversation_id is None:
+        conversation_id = new_conversation_id()
+        logfire.info("Generating chat home page with new conversation", 
+                    conversation_id=conversation_id,
+                    client_ip=request.client.host)
+    return HTMLResponse(_INDEX_TEMPLATE.render(request=request, conversation_id=conversation_id))
 
 @router.post("/send")
 async def send_message(
@@ -65,119 +212,234 @@ async def send_message(
     conversation_manager: ConversationManager = Depends(get_conversation_manager)
 ):
     """Handle sending a message via traditional HTTP request."""
-    try:
-        logfire.info("Message received", 
-                    conversation_id=conversation_id, 
-                    message_length=len(message))
-        
-        # Check for harmful content if moderation is enabled
-        if ai_settings.moderation_enabled:
-            is_harmful, categories = moderate_content(message)
-            if is_harmful:
-                logfire.warning("Message moderated", 
-                               conversation_id=conversation_id,
-                               categories=categories)
+    # One span per turn; outcome details are attached as attributes
+    with logfire.span("chat.turn", conversation_id=conversation_id, message_length=len(message)) as span:
+        try:
+            # Reject malformed input and refuse obvious cases locally; only call
+            # moderation when it is enabled and the message is not already
+            # known to be safe or unsafe
+            verdict = classify(message)
+            span.set_attribute("verdict", verdict)
+            
+            if verdict == "INVALID":
+                return {
+                    "conversation_id": conversation_id,
+                    "message": _INVALID_MSG,
+                    "error": True,
+                    "invalid": True
+                }
+            
+            if verdict == "DIRECT":
+                span.set_attribute("moderated", True)
                 return {
                     "conversation_id": conversation_id,
-                    "message": "I'm sorry, but I cannot respond to this message as it may contain harmful content.",
+                    "message": _REFUSAL,
                     "moderated": True
                 }
             
-        # Add user message to conversation
-        try:
-            conversation_manager.add_message(conversation_id, "user", message)
-            logfire.debug("User message added to conversation", conversation_id=conversation_id)
-        except ValueError as e:
-            logfire.error("Failed to add message to conversation", 
-                         error=str(e), 
-                         conversation_id=conversation_id,
-                         active_conversation_ids=list(active_conversations.keys()))
-            raise HTTPException(status_code=400, detail=str(e))
+            # Serialize turns for this conversation so racing messages cannot interleave
+            async with session_store.turn_lock(conversation_id):
+                if PLACEHOLDER_MODE:
+                    return {
+                        "conversation_id": conversation_id,
+                        "message": await _record_turn(conversation_manager, conversation_id, message, _PLACEHOLDER_FMT(message))
+                    }
+                
+                # Moderate and, when the turn needs it, retrieve relevant context
+                # concurrently; the user message is only recorded once moderation passes
+                try:
+                    recent_turns = await asyncio.to_thread(
+                        conversation_manager.get_conversation_history, conversation_id, limit=RECENT_TURNS
+                    )
+                    # Warm the retrieval cache on the first turn
+                    (is_harmful, categories), query_embedding = await asyncio.gather(
+                        _moderate(message, verdict),
+                        _embed_and_retrieve(conversation_manager, conversation_id, message,
+                                            should_retrieve(message, recent_turns), prefetch=not recent_turns)
+                    )
+                    if is_harmful:
+                        span.set_attributes({"moderated": True, "categories": categories})
+                        return {
+                            "conversation_id": conversation_id,
+                            "message": _REFUSAL,
+                            "moderated": True
+                        }
+                    
+                    # Answer repeats of a question asked in the same context
+                    # from the semantic cache, skipping the completion
+                    cached, cache_key = await _cached_reply(conversation_manager, conversation_id, message, recent_turns, query_embedding)
+                    if cached is not None:
+                        await _record_turn(conversation_manager, conversation_id, message, cached)
+                        span.set_attribute("cache_hit", True)
+                        return {
+                            "conversation_id": conversation_id,
+                            "message": cached
+                        }
+                    
+                    # Record the message and build the context capped to the recent window plus summary
+                    chat_context = await asyncio.to_thread(
+                        conversation_manager.prepare_turn, conversation_id, message, _WINDOW_TURNS
+                    )
+                except ValueError as e:
+                    logfire.error("Failed to add message to conversation", 
+                                 error=str(e), 
+                                 conversation_id=conversation_id,
+                                 active_conversations_count=len(session_store))
+                    raise HTTPException(status_code=400, detail=str(e))
         
-        # Get relevant context
-        context = conversation_manager.retrieve_relevant_context(
-            conversation_id, 
-            message,
-            limit=5,  # Could be configurable
-            threshold=0.7  # Could be configurable
-        )
+                # Call AI model for response using OpenAI service with settings
+                span.set_attributes({"model": _MODEL, "temperature": _TEMP})
+                ai_response = await get_chat_completion_async(chat_context, **_COMPLETION_PARAMS)
         
-        # Get full context for chat completion
-        chat_context = conversation_manager.get_chat_context(conversation_id)
+                # Add assistant response to conversation
+                await asyncio.to_thread(conversation_manager.add_message, conversation_id, "assistant", ai_response)
+                _schedule_summary_refresh(conversation_manager, conversation_id)
+                if cache_key is not None:
+                    await asyncio.to_thread(semantic_cache.store, message, ai_response, cache_key, query_embedding)
         
-        # Call AI model for response using OpenAI service with settings
-        logfire.info("Requesting chat completion", 
-                    conversation_id=conversation_id,
-                    model=ai_settings.model,
-                    temperature=ai_settings.temperature)
+            span.set_attribute("response_length", len(ai_response))
         
-        ai_response = get_chat_completion(
-            messages=chat_context,
-            temperature=ai_settings.temperature,
-            max_tokens=ai_settings.max_tokens,
-            model=ai_settings.model
-        )
-        
-        # Add assistant response to conversation
-        conversation_manager.add_message(conversation_id, "assistant", ai_response)
-        
-        # Get conversation history for display
-        history = conversation_manager.get_conversation_history(conversation_id)
+            # Only the new message is returned; clients fetch history deltas on demand
+            return {
+                "conversation_id": conversation_id,
+                "message": ai_response
+            }
+        except RateLimitExceededError as e:
+            # Handle rate limit errors specifically
+            logfire.warning("Rate limit exceeded", 
+                           conversation_id=conversation_id,
+                           retry_after=e.retry_after)
+            return {
+                "conversation_id": conversation_id,
+                "message": _RATE_LIMIT_MSG,
+                "error": True,
+                "retry_after": e.retry_after
+            }
+        except OpenAIServiceError as e:
+            # Handle OpenAI service errors
+            logfire.error("OpenAI service error", 
+                         conversation_id=conversation_id,
+                         error=str(e))
+            error_message = _AI_UNAVAILABLE_FMT(e)
+            return {
+                "conversation_id": conversation_id,
+                "message": error_message,
+                "error": True
+            }
+        except HTTPException:
+            # Already mapped to a client error, e.g. an unknown conversation
+            raise
+        except Exception as e:
+            logfire.error("Unexpected error in send_message", 
+                         conversation_id=conversation_id,
+                         error=str(e),
+                         error_type=type(e).__name__)
+            raise HTTPException(status_code=500, detail=f"Error processing message: {str(e)}")
+
+async def send_frame(websocket: WebSocket, payload: Dict) -> None:
+    """Send a payload as a binary frame, as msgpack if negotiated and orjson otherwise."""
+    await websocket.send_bytes(msgpack.packb(payload) if websocket.state.msgpack else orjson.dumps(payload))
+
+async def _iter_messages(websocket: WebSocket):
+    """
+    Yield decoded client messages until the client disconnects.
+    
+    Binary frames are decoded in the negotiated encoding; text frames are
+    always JSON, so older clients keep working.
+    """
+    while True:
+        frame = await websocket.receive()
+        if frame["type"] == "websocket.disconnect":
+            return
+        data = frame.get("bytes")
+        if data is None:
+            yield orjson.loads(frame["text"])
+        else:
+            yield msgpack.unpackb(data) if websocket.state.msgpack else orjson.loads(data)
+
+class StreamBuffer:
+    """
+    Coalesces streamed tokens into websocket frames.
+    
+    Pending text is sent once it reaches STREAM_FLUSH_CHARS or
+    STREAM_FLUSH_INTERVAL has passed since the last frame; the full reply
+    is kept as a list of parts and joined once at the end.
+    """
+    
+    def __init__(self, websocket: WebSocket, conversation_id: str):
+        self.websocket = websocket
+        self.conversation_id = conversation_id
+        self.parts: List[str] = []
+        self._pending: List[str] = []
+        self._pending_chars = 0
+        self._loop = asyncio.get_running_loop()
+        self._last_flush = self._loop.time()
         
-        logfire.info("Response generated successfully", 
-                    conversation_id=conversation_id,
-                    response_length=len(ai_response),
-                    history_messages_count=len(history))
+    @property
+    def text(self) -> str:
+        """The full streamed reply so far."""
+        return "".join(self.parts)
         
-        return {
-            "conversation_id": conversation_id,
-            "message": ai_response,
-            "history": history
-        }
-    except RateLimitExceededError as e:
-        # Handle rate limit errors specifically
-        logfire.warning("Rate limit exceeded", 
-                       conversation_id=conversation_id,
-                       retry_after=e.retry_after)
-        return {
-            "conversation_id": conversation_id,
-            "message": "The system is currently experiencing high demand. Please try again in a moment.",
-            "error": True,
-            "retry_after": e.retry_after
-        }
-    except OpenAIServiceError as e:
-        # Handle OpenAI service errors
-        logfire.error("OpenAI service error", 
-                     conversation_id=conversation_id,
-                     error=str(e))
-        error_message = f"The AI service is currently unavailable: {str(e)}"
-        return {
-            "conversation_id": conversation_id,
-            "message": error_message,
-            "error": True
-        }
-    except Exception as e:
-        logfire.error("Unexpected error in send_message", 
-                     conversation_id=conversation_id,
-                     error=str(e),
-                     error_type=type(e).__name__)
-        raise HTTPException(status_code=500, detail=f"Error processing message: {str(e)}")
+    async def add(self, content: str) -> None:
+        """Buffer a chunk of text, flushing if the size or time limit is reached."""
+        self.parts.append(content)
+        self._pending.append(content)
+        self._pending_chars += len(content)
+        if (self._pending_chars >= STREAM_FLUSH_CHARS
+                or self._loop.time() - self._last_flush >= STREAM_FLUSH_INTERVAL):
+            await self.flush()
+            
+    async def flush(self) -> None:
+        """Send any pending text as a single stream frame."""
+        if self._pending:
+            content = "".join(self._pending)
+            if self.websocket.state.msgpack:
+                frame = {"t": "s", "c": content}
+            else:
+                frame = {
+                    "type": "stream",
+                    "content": content,
+                    "conversation_id": self.conversation_id
+                }
+            await send_frame(self.websocket, frame)
+            self._pending.clear()
+            self._pending_chars = 0
+        self._last_flush = self._loop.time()
+
+async def _send_refusal(websocket: WebSocket, conversation_id: str) -> None:
+    """Send the moderation refusal as an assistant message frame."""
+    await send_frame(websocket, {
+        "type": "message",
+        "role": "assistant",
+        "content": _REFUSAL,
+        "conversation_id": conversation_id,
+        "moderated": True
+    })
 
 @router.websocket("/ws/{conversation_id}")
 async def websocket_endpoint(websocket: WebSocket, conversation_id: str):
     """Handle WebSocket connection for real-time chat."""
+    # Per-turn state, released in the finally block so a dropped connection
+    # does not keep large contexts or an open upstream stream alive
+    message_data = None
+    chat_context = None
+    response_stream = None
+    
     try:
-        await websocket.accept()
+        # Use msgpack frames if the client asked for them
+        subprotocol = MSGPACK_SUBPROTOCOL if MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", ()) else None
+        await websocket.accept(subprotocol=subprotocol)
+        websocket.state.msgpack = subprotocol is not None
         
         logfire.info("WebSocket connection established", 
                     conversation_id=conversation_id,
-                    client=websocket.client.host)
+                    client=websocket.client.host,
+                    protocol=subprotocol or "json")
         
         # Get or create conversation manager
-        if conversation_id not in active_conversations:
-            logfire.debug("Creating new conversation manager for websocket", 
-                         conversation_id=conversation_id)
-            manager = ConversationManager(max_conversation_length=ai_settings.max_conversation_messages)
+        conversation_manager = await session_store.get(conversation_id)
+        if conversation_manager is None:
+            manager = ConversationManager(max_conversation_length=_MAX_MESSAGES)
             
             if conversation_id == "new":
                 # Generate a new ID when "new" is specified
@@ -191,143 +453,190 @@ async def websocket_endpoint(websocket: WebSocket, conversation_id: str):
                 # This creates an entry in the manager's internal dictionary
                 manager.create_conversation(conversation_id=conversation_id)
                 
-            active_conversations[conversation_id] = manager
-        
-        conversation_manager = active_conversations[conversation_id]
+            await session_store.set(conversation_id, manager)
+            conversation_manager = manager
         
         # Send initial conversation data
-        await websocket.send_json({
+        await send_frame(websocket, {
             "type": "connection_established",
             "conversation_id": conversation_id
         })
         
-        while True:
-            # Receive message from client
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
+        # Ends cleanly when the client disconnects
+        async for message_data in _iter_messages(websocket):
             
             # Process user message
             user_message = message_data.get("message", "")
             
-            # Check for harmful content if moderation is enabled
-            if ai_settings.moderation_enabled:
-                is_harmful, categories = moderate_content(user_message)
-                if is_harmful:
-                    await websocket.send_json({
+            # Reject malformed input and refuse obvious cases locally; only call
+            # moderation when it is enabled and the message is not already
+            # known to be safe or unsafe
+            verdict = classify(user_message)
+            
+            if verdict == "INVALID":
+                await send_frame(websocket, {
+                    "type": "error",
+                    "message": _INVALID_MSG,
+                    "conversation_id": conversation_id,
+                    "invalid": True
+                })
+                continue
+            
+            if verdict == "DIRECT":
+                await _send_refusal(websocket, conversation_id)
+                continue
+            
+            # Serialize turns for this conversation across connections
+            async with session_store.turn_lock(conversation_id):
+                if PLACEHOLDER_MODE:
+                    await send_frame(websocket, {
                         "type": "message",
                         "role": "assistant",
-                        "content": "I'm sorry, but I cannot respond to this message as it may contain harmful content.",
-                        "conversation_id": conversation_id,
-                        "moderated": True
+                        "content": await _record_turn(conversation_manager, conversation_id, user_message, _PLACEHOLDER_FMT(user_message)),
+                        "conversation_id": conversation_id
                     })
                     continue
-            
-            # Add user message to conversation
-            conversation_manager.add_message(conversation_id, "user", user_message)
-            
-            # Get relevant context
-            context = conversation_manager.retrieve_relevant_context(
-                conversation_id, 
-                user_message,
-                limit=5,  # Could be configurable
-                threshold=0.7  # Could be configurable
-            )
-            
-            # Get chat context for completion
-            chat_context = conversation_manager.get_chat_context(conversation_id)
-            
-            try:
-                # Check if streaming is requested and enabled
-                stream = message_data.get("stream", False) and ai_settings.stream_enabled
+                    
+                # Moderate and, when the turn needs it, retrieve relevant context
+                # concurrently; the user message is only recorded once moderation passes
+                recent_turns = await asyncio.to_thread(
+                    conversation_manager.get_conversation_history, conversation_id, limit=RECENT_TURNS
+                )
+                # Warm the retrieval cache on the first turn
+                (is_harmful, _categories), query_embedding = await asyncio.gather(
+                    _moderate(user_message, verdict),
+                    _embed_and_retrieve(conversation_manager, conversation_id, user_message,
+                                        should_retrieve(user_message, recent_turns), prefetch=not recent_turns)
+                )
+                if is_harmful:
+                    await _send_refusal(websocket, conversation_id)
+                    continue
                 
-                if stream:
-                    # Send a "thinking" status to the client
-                    await websocket.send_json({
-                        "type": "status",
-                        "status": "thinking",
+                # Answer repeats of a question asked in the same context
+                # from the semantic cache, skipping the completion
+                cached, cache_key = await _cached_reply(conversation_manager, conversation_id, user_message, recent_turns, query_embedding)
+                if cached is not None:
+                    await _record_turn(conversation_manager, conversation_id, user_message, cached)
+                    await send_frame(websocket, {
+                        "type": "message",
+                        "role": "assistant",
+                        "content": cached,
                         "conversation_id": conversation_id
                     })
+                    continue
                     
-                    # Get streaming response
-                    response_stream = get_chat_completion(
-                        messages=chat_context,
-                        temperature=ai_settings.temperature,
-                        max_tokens=ai_settings.max_tokens,
-                        model=ai_settings.model,
-                        stream=True
-                    )
+                # Record the message and build the context capped to the recent window plus summary
+                chat_context = await asyncio.to_thread(
+                    conversation_manager.prepare_turn, conversation_id, user_message, _WINDOW_TURNS
+                )
+            
+                try:
+                    # Check if streaming is requested and enabled
+                    stream = message_data.get("stream", False) and _STREAM_ON
+                
+                    if stream:
+                        # Send a "thinking" status to the client
+                        await send_frame(websocket, {
+                            "type": "status",
+                            "status": "thinking",
+                            "conversation_id": conversation_id
+                        })
                     
-                    # Initialize variables for collecting the response
-                    full_response = ""
+                        # Get streaming response
+                        response_stream = await get_chat_completion_async(chat_context, **_STREAM_PARAMS)
                     
-                    # Stream the response chunks to the client
-                    for chunk in response_stream:
-                        if hasattr(chunk.choices[0], 'delta') and hasattr(chunk.choices[0].delta, 'content'):
-                            content = chunk.choices[0].delta.content
-                            if content:
-                                full_response += content
-                                await websocket.send_json({
-                                    "type": "stream",
-                                    "content": content,
-                                    "conversation_id": conversation_id
-                                })
+                        # Stream the response chunks to the client, batching tokens
+                        # until enough text or time has accumulated for a frame
+                        buffer = StreamBuffer(websocket, conversation_id)
+                        async for chunk in response_stream:
+                            if hasattr(chunk.choices[0], 'delta') and hasattr(chunk.choices[0].delta, 'content'):
+                                content = chunk.choices[0].delta.content
+                                if content:
+                                    await buffer.add(content)
                     
-                    # Add the complete response to the conversation history
-                    conversation_manager.add_message(conversation_id, "assistant", full_response)
+                        # Send whatever is left in the buffer
+                        await buffer.flush()
+                        full_response = buffer.text
                     
-                    # Send completion notification
-                    await websocket.send_json({
-                        "type": "stream_end",
-                        "conversation_id": conversation_id
-                    })
-                else:
-                    # Get complete response (non-streaming)
-                    ai_response = get_chat_completion(
-                        messages=chat_context,
-                        temperature=ai_settings.temperature,
-                        max_tokens=ai_settings.max_tokens,
-                        model=ai_settings.model
-                    )
+                        response_stream = None
                     
-                    # Add assistant response to conversation
-                    conversation_manager.add_message(conversation_id, "assistant", ai_response)
+                        # Add the complete response to the conversation history
+                        await asyncio.to_thread(conversation_manager.add_message, conversation_id, "assistant", full_response)
+                        _schedule_summary_refresh(conversation_manager, conversation_id)
+                        if cache_key is not None:
+                            await asyncio.to_thread(semantic_cache.store, user_message, full_response, cache_key, query_embedding)
                     
-                    # Send response to client
-                    await websocket.send_json({
-                        "type": "message",
-                        "role": "assistant",
-                        "content": ai_response,
-                        "conversation_id": conversation_id
-                    })
+                        # Send completion notification
+                        await send_frame(websocket, {
+                            "type": "stream_end",
+                            "conversation_id": conversation_id
+                        })
+                    else:
+                        # Get complete response (non-streaming)
+                        ai_response = await get_chat_completion_async(chat_context, **_COMPLETION_PARAMS)
+                    
+                        # Add assistant response to conversation
+                        await asyncio.to_thread(conversation_manager.add_message, conversation_id, "assistant", ai_response)
+                        _schedule_summary_refresh(conversation_manager, conversation_id)
+                        if cache_key is not None:
+                            await asyncio.to_thread(semantic_cache.store, user_message, ai_response, cache_key, query_embedding)
+                    
+                        # Send response to client
+                        await send_frame(websocket, {
+                            "type": "message",
+                            "role": "assistant",
+                            "content": ai_response,
+                            "conversation_id": conversation_id
+                        })
             
-            except RateLimitExceededError as e:
-                # Handle rate limit errors specifically
-                await websocket.send_json({
-                    "type": "error",
-                    "message": "The system is currently experiencing high demand. Please try again in a moment.",
-                    "conversation_id": conversation_id,
-                    "retry_after": e.retry_after
-                })
-            except OpenAIServiceError as e:
-                # Handle OpenAI service errors
-                error_message = f"The AI service is currently unavailable: {str(e)}"
+                except asyncio.CancelledError:
+                    raise
+                except RateLimitExceededError as e:
+                    # Handle rate limit errors specifically
+                    if websocket.application_state == WebSocketState.CONNECTED:
+                        await send_frame(websocket, {
+                            "type": "error",
+                            "message": _RATE_LIMIT_MSG,
+                            "conversation_id": conversation_id,
+                            "retry_after": e.retry_after
+                        })
+                except OpenAIServiceError as e:
+                    # Handle OpenAI service errors
+                    error_message = _AI_UNAVAILABLE_FMT(e)
                 
-                await websocket.send_json({
-                    "type": "error",
-                    "message": error_message,
-                    "conversation_id": conversation_id
-                })
+                    if websocket.application_state == WebSocketState.CONNECTED:
+                        await send_frame(websocket, {
+                            "type": "error",
+                            "message": error_message,
+                            "conversation_id": conversation_id
+                        })
             
+    except asyncio.CancelledError:
+        # Server shutdown or task cancellation; cleanup runs in finally
+        raise
     except WebSocketDisconnect:
-        # Handle client disconnect
+        # Client went away while a reply was being sent
         pass
     except Exception as e:
-        # Handle other errors
-        if websocket.client_state.CONNECTED:
-            await websocket.send_json({
-                "type": "error",
-                "message": str(e)
-            })
+        # Handle other errors; the transport may already be gone
+        if websocket.application_state == WebSocketState.CONNECTED:
+            with contextlib.suppress(RuntimeError):
+                await send_frame(websocket, {
+                    "type": "error",
+                    "message": str(e)
+                })
+    finally:
+        # Close an interrupted upstream stream and drop frame references
+        if response_stream is not None:
+            try:
+                await response_stream.close()
+            except Exception as e:
+                logfire.warning("Failed to close completion stream",
+                               conversation_id=conversation_id,
+                               error=str(e))
+        response_stream = None
+        chat_context = None
+        message_data = None
 
 @router.get("/history/{conversation_id}", response_class=HTMLResponse)
 async def conversation_history(
@@ -337,15 +646,33 @@ async def conversation_history(
 ):
     """View conversation history."""
     try:
-        history = conversation_manager.get_conversation_history(conversation_id)
+        history = await asyncio.to_thread(conversation_manager.get_conversation_history, conversation_id)
         
-        return templates.TemplateResponse(
-            "chat/history.html", 
-            {"request": request, "history": history, "conversation_id": conversation_id}
-        )
+        return HTMLResponse(_HISTORY_TEMPLATE.render(
+            request=request,
+            history=history,
+            conversation_id=conversation_id
+        ))
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Conversation not found: {str(e)}")
 
+@router.get("/history/{conversation_id}/delta")
+async def conversation_history_delta(
+    conversation_id: str,
+    since: int = -1,
+    conversation_manager: ConversationManager = Depends(get_conversation_manager)
+):
+    """Get the messages added after the client's last-seen message ID."""
+    try:
+        messages = await asyncio.to_thread(conversation_manager.get_messages_since, conversation_id, since)
+        
+        return {
+            "conversation_id": conversation_id,
+            "messages": messages
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=f"Conversation not found: {str(e)}")
+
 @router.post("/end/{conversation_id}")
 async def end_conversation(
     conversation_id: str,
@@ -353,11 +680,10 @@ async def end_conversation(
 ):
     """End a conversation and archive it."""
     try:
-        result = conversation_manager.end_conversation(conversation_id)
+        result = await asyncio.to_thread(conversation_manager.end_conversation, conversation_id)
         
         # Remove from active conversations
-        if conversation_id in active_conversations:
-            del active_conversations[conversation_id]
+        await session_store.pop(conversation_id)
             
         return result
     except Exception as e:
@@ -1,35 +1,71 @@
-from fastapi import APIRouter, Request, Depends, HTTPException, Form, UploadFile, File
+from fastapi import APIRouter, Request, Depends, HTTPException, Form, Query, UploadFile, File
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from typing import Optional
-import json
+import asyncio
+import codecs
+from functools import lru_cache
+import jinja2
+import orjson
 import os
+import tempfile
 from pathlib import Path
 
 from app.services.document_service import DocumentService
 
-# Set up templates
+# Set up templates; list pages render asynchronously and stream as they go
 templates = Jinja2Templates(directory=str(Path("app/templates")))
+_async_templates = Jinja2Templates(env=jinja2.Environment(
+    loader=jinja2.FileSystemLoader(str(Path("app/templates"))),
+    enable_async=True,
+    autoescape=True
+))
+_INDEX_TEMPLATE = _async_templates.get_template("documents/index.html")
 
 router = APIRouter()
 
+# Uploads are read in chunks and spill to disk past this size
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_SPOOL_MAX_SIZE = 1_000_000
+
+# Documents listed per page on the home page
+DOCUMENTS_PAGE_SIZE = 20
+
+@lru_cache(maxsize=1)
+def _document_service() -> DocumentService:
+    """Create the process-wide DocumentService, so its clients are built once."""
+    return DocumentService()
+
 def get_document_service():
     """Dependency for DocumentService."""
     try:
-        return DocumentService()
+        return _document_service()
     except Exception as e:
         raise HTTPException(status_code=500, detail="Document service unavailable")
 
 @router.get("/", response_class=HTMLResponse)
 async def documents_home(
     request: Request,
+    page: int = Query(1, ge=1),
     document_service: DocumentService = Depends(get_document_service)
 ):
-    """Document management home page."""
-    documents = document_service.get_all_documents(limit=100)
-    return templates.TemplateResponse(
-        "documents/index.html", 
-        {"request": request, "documents": documents}
+    """Document management home page, one page of documents at a time."""
+    # Fetch one extra row to tell whether there is a next page
+    documents = await asyncio.to_thread(
+        document_service.get_all_documents,
+        limit=DOCUMENTS_PAGE_SIZE + 1,
+        offset=(page - 1) * DOCUMENTS_PAGE_SIZE
+    )
+    has_next = len(documents) > DOCUMENTS_PAGE_SIZE
+    
+    return StreamingResponse(
+        _INDEX_TEMPLATE.generate_async(
+            request=request,
+            documents=documents[:DOCUMENTS_PAGE_SIZE],
+            page=page,
+            has_next=has_next
+        ),
+        media_type="text/html"
     )
 
 @router.get("/search", response_class=HTMLResponse)
@@ -77,8 +113,8 @@ async def create_document(
     metadata_dict = {}
     if metadata:
         try:
-            metadata_dict = json.loads(metadata)
-        except json.JSONDecodeError:
+            metadata_dict = orjson.loads(metadata)
+        except orjson.JSONDecodeError:
             # If not valid JSON, treat as plain text
             metadata_dict = {"notes": metadata}
     
@@ -111,12 +147,7 @@ async def upload_document(
     document_service: DocumentService = Depends(get_document_service)
 ):
     """Handle document upload form submission."""
-    content = await file.read()
-    
-    try:
-        content_str = content.decode("utf-8")
-    except UnicodeDecodeError:
-        raise HTTPException(status_code=400, detail="File must be a text document")
+    content = await _spool_upload(file)
     
     # Use filename as title if not provided
     if not title:
@@ -128,11 +159,12 @@ async def upload_document(
         "content_type": file.content_type
     }
     
-    document = document_service.store_document(
-        title=title,
-        content=content_str,
-        metadata=metadata
-    )
+    with content:
+        document = document_service.store_document(
+            title=title,
+            content=content,
+            metadata=metadata
+        )
     
     if not document:
         raise HTTPException(status_code=500, detail="Failed to store document")
@@ -142,6 +174,26 @@ async def upload_document(
     
     return RedirectResponse(url=f"/documents/{document_id}", status_code=303)
 
+async def _spool_upload(file: UploadFile) -> tempfile.SpooledTemporaryFile:
+    """
+    Decode an upload chunk by chunk into a spooled temporary file.
+    
+    Invalid UTF-8 is rejected as soon as it is read, and large files spill
+    to disk instead of being held in memory.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_SIZE, mode="w+", encoding="utf-8")
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            spool.write(decoder.decode(chunk))
+        spool.write(decoder.decode(b"", final=True))
+    except UnicodeDecodeError:
+        spool.close()
+        raise HTTPException(status_code=400, detail="File must be a text document")
+    
+    spool.seek(0)
+    return spool
+
 @router.get("/{document_id}", response_class=HTMLResponse)
 async def view_document(
     request: Request,
@@ -188,8 +240,8 @@ async def update_document(
     metadata_dict = None
     if metadata:
         try:
-            metadata_dict = json.loads(metadata)
-        except json.JSONDecodeError:
+            metadata_dict = orjson.loads(metadata)
+        except orjson.JSONDecodeError:
             # If not valid JSON, treat as plain text
             metadata_dict = {"notes": metadata}
     
@@ -0,0 +1,11 @@
+-- Replace the IVFFlat index on document_chunks with an HNSW index
+-- IVFFlat lists are fixed when the index is built, so recall drops as chunks
+-- are added afterwards; HNSW needs no training step and keeps the
+-- match_document_chunks* functions on an index scan as the table grows.
+-- Requires pgvector 0.5.0 or later.
+
+DROP INDEX IF EXISTS document_chunks_embedding_idx;
+
+CREATE INDEX IF NOT EXISTS document_chunks_embedding_hnsw_idx ON document_chunks
+USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64);
@@ -0,0 +1,74 @@
+-- Hybrid keyword + vector search over document chunks
+-- Short exact-match queries (error codes, product names) are found by full-text
+-- rank even when their embedding is a weak match, while longer questions are
+-- still retrieved by meaning. Requires the document_chunks table from
+-- setup_document_search.sql.
+
+-- Full-text vector kept in sync with content by Postgres
+ALTER TABLE document_chunks
+ADD COLUMN IF NOT EXISTS content_tsv tsvector
+GENERATED ALWAYS AS (to_tsvector('english', content)) STORED;
+
+CREATE INDEX IF NOT EXISTS document_chunks_content_tsv_idx ON document_chunks
+USING gin (content_tsv);
+
+-- Each side contributes its top candidates; keyword rank is normalized to [0, 1]
+-- against the best keyword hit, then combined with cosine similarity
+CREATE OR REPLACE FUNCTION hybrid_search_document_chunks(
+  query_text text,
+  query_embedding vector,
+  match_count int DEFAULT 5,
+  match_threshold float DEFAULT 0.7,
+  keyword_weight float DEFAULT 0.4,
+  semantic_weight float DEFAULT 0.6
+)
+RETURNS TABLE (
+  id uuid,
+  document_id uuid,
+  content text,
+  metadata jsonb,
+  keyword_score float,
+  semantic_score float,
+  similarity float
+)
+LANGUAGE sql STABLE
+AS $$
+  WITH semantic AS (
+    SELECT
+      dc.id,
+      GREATEST(1 - (dc.embedding <=> query_embedding), 0) AS score
+    FROM document_chunks dc
+    ORDER BY dc.embedding <=> query_embedding
+    LIMIT match_count * 4
+  ),
+  keyword AS (
+    SELECT
+      dc.id,
+      ts_rank_cd(dc.content_tsv, q) AS score
+    FROM document_chunks dc, websearch_to_tsquery('english', query_text) q
+    WHERE dc.content_tsv @@ q
+    ORDER BY score DESC
+    LIMIT match_count * 4
+  ),
+  combined AS (
+    SELECT
+      COALESCE(s.id, k.id) AS id,
+      COALESCE(k.score / NULLIF(MAX(k.score) OVER (), 0), 0) AS keyword_score,
+      COALESCE(s.score, 0) AS semantic_score
+    FROM semantic s
+    FULL OUTER JOIN keyword k ON s.id = k.id
+  )
+  SELECT
+    dc.id,
+    dc.document_id,
+    dc.content,
+    dc.metadata,
+    c.keyword_score,
+    c.semantic_score,
+    keyword_weight * c.keyword_score + semantic_weight * c.semantic_score AS similarity
+  FROM combined c
+  JOIN document_chunks dc ON dc.id = c.id
+  WHERE c.keyword_score > 0 OR c.semantic_score > match_threshold
+  ORDER BY similarity DESC
+  LIMIT match_count;
+$$;
@@ -0,0 +1,40 @@
+-- Create vector similarity search function that also returns chunk embeddings
+-- Used to fill the per-conversation warm cache, which ranks follow-up queries
+-- locally instead of querying the index again
+
+CREATE OR REPLACE FUNCTION match_document_chunks_with_embeddings(
+  query_embedding vector,
+  match_threshold float DEFAULT 0.5,
+  match_count int DEFAULT 50
+)
+RETURNS TABLE (
+  id uuid,
+  document_id uuid,
+  content text,
+  metadata jsonb,
+  embedding vector,
+  similarity float
+)
+LANGUAGE plpgsql
+-- An HNSW scan returns at most hnsw.ef_search rows (default 40), which is
+-- below the 50 chunks requested when warming the per-conversation cache
+SET hnsw.ef_search = 100
+AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    dc.id,
+    dc.document_id,
+    dc.content,
+    dc.metadata,
+    dc.embedding,
+    1 - (dc.embedding <=> query_embedding) AS similarity
+  FROM
+    document_chunks dc
+  WHERE
+    1 - (dc.embedding <=> query_embedding) > match_threshold
+  ORDER BY
+    dc.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
@@ -26,9 +26,9 @@ CREATE TABLE IF NOT EXISTS document_chunks (
 );
 
 -- Create index for faster embedding similarity search
-CREATE INDEX IF NOT EXISTS document_chunks_embedding_idx ON document_chunks 
-USING ivfflat (embedding vector_cosine_ops)
-WITH (lists = 100);
+CREATE INDEX IF NOT EXISTS document_chunks_embedding_hnsw_idx ON document_chunks 
+USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64);
 
 -- Create vector similarity search function
 CREATE OR REPLACE FUNCTION match_document_chunks(
@@ -3,12 +3,23 @@
 Apply Supabase Migrations
 
 This script applies SQL migrations to the Supabase database.
+
+When a direct Postgres connection string is configured (SUPABASE__DB_URL or
+DATABASE_URL), statements run over psycopg in a single transaction and each
+applied file is recorded by content hash in schema_migrations, so rerunning
+an unchanged migration is a no-op. Otherwise the whole file is sent through
+the pgadmin_exec_sql RPC.
 """
 
 import os
 import sys
 import argparse
+import hashlib
 import logging
+from pathlib import Path
+from typing import List, Optional
+import psycopg
+import sqlparse
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
@@ -34,24 +45,109 @@ def get_supabase_client() -> Client:
     
     return create_client(supabase_url, supabase_key)
 
-def apply_migration(migration_file: str) -> bool:
+def get_database_url() -> Optional[str]:
+    """Get the direct Postgres connection string, if one is configured."""
+    return os.getenv("SUPABASE__DB_URL") or os.getenv("DATABASE_URL")
+
+def split_statements(sql: str) -> List[str]:
+    """Split a migration into individual statements, dropping comment-only fragments."""
+    return [
+        statement.strip()
+        for statement in sqlparse.split(sql)
+        if sqlparse.format(statement, strip_comments=True).strip()
+    ]
+
+CREATE_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  sha bytea PRIMARY KEY,
+  filename text NOT NULL,
+  applied_at timestamp with time zone NOT NULL DEFAULT now()
+)
+"""
+
+def migration_digest(data: bytes) -> bytes:
+    """Hash a migration file's contents; an edited file gets a new digest."""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+def apply_with_psycopg(
+    data: bytes,
+    filename: str,
+    database_url: str,
+    force: bool = False
+) -> bool:
+    """
+    Run a migration's statements in one transaction over a direct connection.
+    
+    Statements are pipelined, so a migration made of many small DDL
+    statements does not pay a round trip for each one. The migration is
+    recorded in schema_migrations in the same transaction, and any failure
+    rolls back the whole migration.
+    
+    Args:
+        data: Raw contents of the migration file
+        filename: Name recorded alongside the digest
+        database_url: Postgres connection string
+        force: Apply the file even if the same contents were applied before
+        
+    Returns:
+        True if the migration was applied, False if it was already applied
+    """
+    sha = migration_digest(data)
+    
+    with psycopg.connect(database_url) as conn:
+        with conn.cursor() as cur:
+            cur.execute(CREATE_MIGRATIONS_TABLE)
+            cur.execute("SELECT 1 FROM schema_migrations WHERE sha = %s", (sha,))
+            if cur.fetchone() and not force:
+                return False
+            
+        statements = split_statements(data.decode("utf-8"))
+        logger.info(f"Executing {len(statements)} statements")
+        
+        with conn.pipeline(), conn.cursor() as cur:
+            for number, statement in enumerate(statements, 1):
+                summary = sqlparse.format(statement, strip_comments=True).strip().splitlines()[0]
+                logger.debug(f"[{number}/{len(statements)}] {summary}")
+                cur.execute(statement)
+            cur.execute(
+                "INSERT INTO schema_migrations (sha, filename) VALUES (%s, %s) "
+                "ON CONFLICT (sha) DO UPDATE SET filename = EXCLUDED.filename, applied_at = now()",
+                (sha, filename)
+            )
+    
+    return True
+
+def apply_migration(migration_file: str, force: bool = False) -> bool:
     """
     Apply a SQL migration file to the Supabase database.
     
     Args:
         migration_file: Path to the SQL migration file
+        force: Reapply the file even if it is recorded as applied
         
     Returns:
-        True if successful
+        True if successful or already applied
     """
     # Read the migration file
     try:
-        with open(migration_file, 'r') as f:
-            sql = f.read()
+        data = Path(migration_file).read_bytes()
     except Exception as e:
         logger.error(f"Failed to read migration file: {str(e)}")
         return False
     
+    database_url = get_database_url()
+    if database_url:
+        try:
+            logger.info(f"Applying migration over a direct connection: {migration_file}")
+            if apply_with_psycopg(data, Path(migration_file).name, database_url, force=force):
+                logger.info(f"Migration applied successfully")
+            else:
+                logger.info(f"Migration already applied, skipping: {migration_file}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to apply migration: {str(e)}")
+            return False
+    
     # Get Supabase client
     try:
         supabase = get_supabase_client()
@@ -64,7 +160,7 @@ def apply_migration(migration_file: str) -> bool:
         logger.info(f"Applying migration: {migration_file}")
         
         # Execute the raw SQL
-        response = supabase.rpc("pgadmin_exec_sql", {"sql": sql}).execute()
+        response = supabase.rpc("pgadmin_exec_sql", {"sql": data.decode("utf-8")}).execute()
         
         logger.info(f"Migration applied successfully")
         return True
@@ -76,13 +172,14 @@ def main():
     """Main entry point."""
     parser = argparse.ArgumentParser(description="Apply Supabase migrations")
     parser.add_argument("file", help="SQL migration file to apply")
+    parser.add_argument("--force", action="store_true", help="Reapply even if this file was already applied")
     args = parser.parse_args()
     
     if not os.path.exists(args.file):
         logger.error(f"Migration file not found: {args.file}")
         sys.exit(1)
     
-    success = apply_migration(args.file)
+    success = apply_migration(args.file, force=args.force)
     
     if success:
         logger.info("Migration completed successfully")
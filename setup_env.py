@@ -7,6 +7,7 @@ for required API keys.
 """
 
 import os
+import re
 import sys
 from typing import Dict, Any
 
@@ -41,14 +42,13 @@ for key, prompt in required_keys.items():
     value = input(prompt)
     values[key] = value
 
-# Replace values in the template
-env_content = env_template
-for key, value in values.items():
-    if value:  # Only replace if the user entered a value
-        env_content = env_content.replace(f'{key}=your_openai_api_key' if 'OPENAI' in key 
-                                        else f'{key}=your_supabase_service_key' if 'SUPABASE' in key
-                                        else f'{key}=your_logfire_api_key',
-                                     f'{key}={value}')
+# Replace values in the template in a single pass, keeping the
+# placeholder line for any key the user left empty
+key_pattern = re.compile(r'^(' + '|'.join(map(re.escape, required_keys)) + r')=.*$', re.M)
+env_content = key_pattern.sub(
+    lambda match: f'{match.group(1)}={values[match.group(1)]}' if values.get(match.group(1)) else match.group(0),
+    env_template
+)
 
 # Write to .env file
 with open('.env', 'w') as f:
@@ -1,11 +1,14 @@
 """Common fixtures for tests."""
 
-import os
-import pytest
-from unittest.mock import patch, MagicMock, AsyncMock
+# Import test helpers first to set up the environment for every test module
+import tests.helpers  # noqa: F401
 
-# Import test helpers to set up environment
-import tests.helpers
+import importlib
+import sys
+import pytest
+from contextlib import ExitStack, contextmanager
+from types import SimpleNamespace
+from unittest.mock import MagicMock, AsyncMock
 
 # OpenAI mock classes
 class MockOpenAIResponse:
@@ -24,10 +27,13 @@ class MockOpenAIChoice:
     def __init__(self, message=None):
         self.message = message or MockOpenAIMessage()
 
+# Shared, immutable default vector so mocks don't rebuild 1536 floats each time
+_MOCK_EMBEDDING = (0.1,) * 1536
+
 class MockEmbedding:
     """Mock for OpenAI embedding."""
     def __init__(self, embedding=None):
-        self.embedding = embedding or [0.1] * 1536
+        self.embedding = embedding if embedding is not None else _MOCK_EMBEDDING
 
 # Mock for OpenAI client
 class MockOpenAI:
@@ -49,44 +55,49 @@ class MockOpenAI:
             )
         )
 
+def _empty_response():
+    """Build an empty query result; real responses expose their rows as a .data list."""
+    return SimpleNamespace(data=[])
+
 # Mock for Supabase client
 class MockSupabase:
     """Mock for Supabase client."""
     def __init__(self, url=None, key=None):
-        self.table = MagicMock()
-        self.table.return_value = self
-        
-        self.from_ = MagicMock()
-        self.from_.return_value = self
-        
-        self.select = MagicMock()
-        self.select.return_value = self
-        
-        self.insert = MagicMock()
-        self.insert.return_value = self
-        
-        self.update = MagicMock()
-        self.update.return_value = self
-        
-        self.delete = MagicMock()
-        self.delete.return_value = self
-        
-        self.order = MagicMock()
-        self.order.return_value = self
-        
-        self.limit = MagicMock()
-        self.limit.return_value = self
-        
-        self.execute = MagicMock()
-        self.execute.return_value = {"data": []}
-        
-        self.rpc = MagicMock()
-        self.rpc.return_value = {"data": []}
-        
         self.storage = MagicMock()
         self.storage.from_.return_value.upload.return_value = {"path": "test_path"}
         
         self.auth = MagicMock()
+    
+    # Query builder methods chain back to the client
+    def table(self, *args, **kwargs):
+        return self
+    
+    def from_(self, *args, **kwargs):
+        return self
+    
+    def select(self, *args, **kwargs):
+        return self
+    
+    def insert(self, *args, **kwargs):
+        return self
+    
+    def update(self, *args, **kwargs):
+        return self
+    
+    def delete(self, *args, **kwargs):
+        return self
+    
+    def order(self, *args, **kwargs):
+        return self
+    
+    def limit(self, *args, **kwargs):
+        return self
+    
+    def execute(self, *args, **kwargs):
+        return _empty_response()
+    
+    def rpc(self, *args, **kwargs):
+        return _empty_response()
 
 @pytest.fixture
 def supabase_client():
@@ -98,36 +109,48 @@ def openai_client():
     """Create and return a mocked OpenAI client for testing."""
     return MockOpenAI()
 
-@pytest.fixture(autouse=True)
-def mock_logfire():
-    """Mock logfire to avoid making real external calls during tests."""
-    with patch('logfire.configure'), \
-         patch('logfire.info'), \
-         patch('logfire.debug'), \
-         patch('logfire.warning'), \
-         patch('logfire.error'):
+@contextmanager
+def _swap_attrs(target, **replacements):
+    """Set attributes on a module directly and restore the originals on exit."""
+    saved = {name: getattr(target, name) for name in replacements}
+    for name, value in replacements.items():
+        setattr(target, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(target, name, value)
+
+@contextmanager
+def _patch_everywhere(source_name, name, replacement):
+    """Replace an attribute on its source module and on every loaded module
+    that already imported it by name, restoring all of them on exit.
+    
+    Patching the source means modules imported later, including lazily
+    inside a test, bind the replacement too.
+    """
+    source = importlib.import_module(source_name)
+    original = getattr(source, name)
+    targets = [source] + [
+        module for module_name, module in list(sys.modules.items())
+        if module_name.startswith(("app.", "pydantic_ai."))
+        and getattr(module, name, None) is original
+    ]
+    with ExitStack() as stack:
+        for target in targets:
+            stack.enter_context(_swap_attrs(target, **{name: replacement}))
         yield
 
-@pytest.fixture(autouse=True)
+@pytest.fixture(scope="session", autouse=True)
 def mock_openai_client():
     """Mock OpenAI client globally to avoid real API calls during tests."""
-    with patch('openai.OpenAI', MockOpenAI), \
-         patch('openai.AsyncOpenAI', MockOpenAI), \
-         patch('pydantic_ai.providers.openai.AsyncOpenAI', MockOpenAI):
+    with _patch_everywhere("openai", "OpenAI", MockOpenAI), \
+         _patch_everywhere("openai", "AsyncOpenAI", MockOpenAI):
         yield
 
-@pytest.fixture(autouse=True)
+@pytest.fixture(scope="session", autouse=True)
 def mock_supabase_client():
     """Mock Supabase client globally to avoid real API calls during tests."""
-    with patch('supabase.create_client', return_value=MockSupabase()):
+    client = MockSupabase()
+    with _patch_everywhere("supabase", "create_client", lambda *args, **kwargs: client):
         yield
-
-@pytest.fixture(autouse=True)
-def setup_env():
-    """Set up environment variables for testing"""
-    os.environ['OPENAI_API_KEY'] = 'sk-test-key'
-    os.environ['SUPABASE_URL'] = 'https://example.supabase.co'  
-    os.environ['SUPABASE_KEY'] = 'test-key'
-    os.environ['TEST_MOCK_OPENAI'] = 'true'
-    os.environ['TEST_MOCK_SUPABASE'] = 'true'
-    yield 
\ No newline at end of file
@@ -1,14 +1,24 @@
 """
 Helper module for tests that sets environment variables before any other imports
-This module must be imported before any app modules in test files.
+tests/conftest.py imports it first, so test files do not need to.
 """
 import os
+import sys
 from pathlib import Path
-from dotenv import load_dotenv
 
-# Load test environment variables from .env.test
+# Swap logfire for the no-op shim that logfire_api provides when the real SDK
+# can't be imported, so tests never load the SDK or start its exporters.
+# pytest.ini disables logfire's pytest plugin for the same reason.
+sys.modules['logfire'] = None
+import logfire_api
+sys.modules['logfire'] = logfire_api
+os.environ['PYDANTIC_DISABLE_PLUGINS'] = 'logfire-plugin'
+
+# Load test environment variables from .env.test, if one exists
 test_env_path = Path(__file__).parent.parent.parent / '.env.test'
-load_dotenv(test_env_path)
+if test_env_path.exists():
+    from dotenv import load_dotenv
+    load_dotenv(test_env_path)
 
 # These settings override any from .env.test if needed
 os.environ['TEST_MOCK_OPENAI'] = 'true'
@@ -1,13 +1,23 @@
 """Tests for the chat service."""
 
-# Import test helper first to set environment variables
-import tests.helpers
-
 import pytest
 import logfire
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
 
+from app.models.agent import SupportResult, support_agent
 from app.services.chat_service import ChatService
 
+# Agent result returned by the patched support_agent.run; built once since it is never mutated
+_MOCK_RESULT = SimpleNamespace(
+    data=SupportResult(
+        support_response="This is a test response.",
+        needs_followup=False,
+        suggested_documents=["doc-123"]
+    )
+)
+_MOCK_AGENT_RUN = AsyncMock(return_value=_MOCK_RESULT)
+
 
 @pytest.fixture
 def chat_service(supabase_client):
@@ -29,8 +39,7 @@ def sample_messages():
     ]
 
 
-@pytest.mark.asyncio
-async def test_chat_service_initialization(chat_service):
+def test_chat_service_initialization(chat_service):
     """Test that the chat service initializes correctly."""
     assert chat_service is not None
     assert chat_service.supabase is not None
@@ -53,36 +62,23 @@ async def test_get_conversation_history(chat_service):
 
 
 @pytest.mark.asyncio
-async def test_process_message(chat_service, sample_messages, monkeypatch):
+async def test_process_message(chat_service, sample_messages):
     """Test processing a message.
     
     Note: This test patches the support_agent.run method to avoid making actual API calls.
     """
-    from app.models.agent import SupportResult
-    
-    # Create a mock result for the agent
-    mock_result = type('MockResult', (), {
-        'data': SupportResult(
-            support_response="This is a test response.",
-            needs_followup=False,
-            suggested_documents=["doc-123"]
+    # Swap in the mock directly and restore the original afterwards
+    original_run = support_agent.run
+    support_agent.run = _MOCK_AGENT_RUN
+    try:
+        # Run the test
+        response = await chat_service.process_message(
+            sample_messages,
+            customer_id="test-customer-id",
+            product_serial="test-serial"
         )
-    })
-    
-    # Create a mock for the agent.run method
-    async def mock_agent_run(*args, **kwargs):
-        return mock_result
-    
-    # Apply the monkeypatch
-    from app.models.agent import support_agent
-    monkeypatch.setattr(support_agent, "run", mock_agent_run)
-    
-    # Run the test
-    response = await chat_service.process_message(
-        sample_messages,
-        customer_id="test-customer-id",
-        product_serial="test-serial"
-    )
+    finally:
+        support_agent.run = original_run
     
     # Verify the response
     assert response is not None
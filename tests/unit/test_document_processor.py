@@ -1,15 +1,8 @@
 """Tests for the document processor service."""
 
-import os
-import tempfile
-from pathlib import Path
-
 import pytest
 import logfire
 
-# Import test helper first to set environment variables
-import tests.helpers
-
 from app.services.document_processor import DocumentProcessor
 
 
@@ -23,24 +16,19 @@ def document_processor(supabase_client):
     return processor
 
 
-@pytest.fixture
-def sample_text_file():
-    """Create a temporary text file for testing."""
-    with tempfile.NamedTemporaryFile(mode='w+', suffix='.txt', delete=False) as temp:
-        temp.write("This is a sample text file for testing document processing.\n")
-        temp.write("It contains multiple lines of text to test chunking.\n")
-        temp.write("The document processor should be able to process this file.\n")
-        temp_path = temp.name
-    
-    # Return the path for use in tests
-    yield Path(temp_path)
-    
-    # Clean up after test
-    os.unlink(temp_path)
+@pytest.fixture(scope="session")
+def sample_text_file(tmp_path_factory):
+    """Create a temporary text file shared by the tests that only read it."""
+    path = tmp_path_factory.mktemp("documents") / "sample.txt"
+    path.write_text(
+        "This is a sample text file for testing document processing.\n"
+        "It contains multiple lines of text to test chunking.\n"
+        "The document processor should be able to process this file.\n"
+    )
+    return path
 
 
-@pytest.mark.asyncio
-async def test_document_processor_initialization(document_processor):
+def test_document_processor_initialization(document_processor):
     """Test that the document processor initializes correctly."""
     assert document_processor is not None
     assert document_processor.openai_client is not None
@@ -48,8 +36,7 @@ async def test_document_processor_initialization(document_processor):
     logfire.info("Document processor initialization test successful")
 
 
-@pytest.mark.asyncio
-async def test_text_extraction(document_processor, sample_text_file):
+def test_text_extraction(document_processor, sample_text_file):
     """Test that text extraction works for a simple text file."""
     text = document_processor._extract_text(sample_text_file)
     
@@ -60,8 +47,7 @@ async def test_text_extraction(document_processor, sample_text_file):
     logfire.info("Text extraction test successful", text_length=len(text))
 
 
-@pytest.mark.asyncio
-async def test_text_chunking(document_processor):
+def test_text_chunking(document_processor):
     """Test that text chunking works correctly."""
     # Create a test text with repeating patterns to test chunking
     test_text = "Line " * 500  # Should be long enough to create multiple chunks
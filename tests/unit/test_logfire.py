@@ -1,26 +1,16 @@
 """Tests for Logfire logging."""
 
-# Import test helper first to set environment variables
-import tests.helpers
-
-import pytest
 import logging
 from unittest.mock import patch
 import time
 
 
-@pytest.mark.asyncio
-async def test_logfire_configuration():
-    """Test that logfire is properly configured."""
-    # Just a simple assertion since actual logfire is mocked in conftest.py
-    assert True
-
-
-@pytest.mark.asyncio
-async def test_logfire_levels():
-    """Test that different log levels work."""
+def test_logfire_smoke():
+    """Test that each log level and structured data are logged.
     
-    # Use standard Python logging instead of logfire in tests
+    Actual logfire is mocked in conftest.py, so standard Python logging is
+    exercised instead. The checks share one test to pay the per-test setup once.
+    """
     with patch('logging.debug') as mock_debug, \
          patch('logging.info') as mock_info, \
          patch('logging.warning') as mock_warning, \
@@ -32,18 +22,7 @@ async def test_logfire_levels():
         logging.warning("Warning test message")
         logging.error("Error test message")
         
-        # Check that they were called
-        mock_debug.assert_called_once()
-        mock_info.assert_called_once()
-        mock_warning.assert_called_once()
-        mock_error.assert_called_once()
-
-
-@pytest.mark.asyncio
-async def test_logfire_structured_data():
-    """Test that structured data is logged correctly."""
-    # Use Python's standard logging instead
-    with patch('logging.info') as mock_info:
+        # Log structured data
         logging.info(
             "Structured data test",
             extra={
@@ -57,6 +36,9 @@ async def test_logfire_structured_data():
             }
         )
         
-        # Check it was called
-        mock_info.assert_called_once()
-        assert True 
\ No newline at end of file
+        # Check that they were called
+        mock_debug.assert_called_once()
+        assert mock_info.call_count == 2
+        mock_warning.assert_called_once()
+        mock_error.assert_called_once()
+        assert "extra" in mock_info.call_args.kwargs
\ No newline at end of file
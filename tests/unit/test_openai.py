@@ -4,8 +4,7 @@ import pytest
 import logfire
 
 
-@pytest.mark.asyncio
-async def test_openai_connection(openai_client):
+def test_openai_connection(openai_client):
     """Test that we can connect to the OpenAI API."""
     try:
         # Make a simple models list request to verify the API key works
@@ -20,8 +19,7 @@ async def test_openai_connection(openai_client):
         pytest.fail(f"OpenAI connection failed: {e}")
 
 
-@pytest.mark.asyncio
-async def test_openai_embedding(openai_client):
+def test_openai_embedding(openai_client):
     """Test that we can generate embeddings with OpenAI."""
     try:
         # Create a simple embedding
@@ -44,8 +42,7 @@ async def test_openai_embedding(openai_client):
         pytest.fail(f"OpenAI embedding generation failed: {e}")
 
 
-@pytest.mark.asyncio
-async def test_openai_chat_completion(openai_client):
+def test_openai_chat_completion(openai_client):
     """Test that we can generate chat completions with OpenAI."""
     try:
         # Create a simple chat completion
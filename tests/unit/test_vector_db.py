@@ -2,11 +2,13 @@
 
 import pytest
 import logfire
-import tests.helpers
 from unittest.mock import MagicMock
 
 from app.utils.vector_db import VectorDB
 
+# Built once; the fixture hands the same vector to every test
+_MOCK_EMBEDDING = [0.1] * 1536
+
 
 @pytest.fixture
 def vector_db(supabase_client):
@@ -18,13 +20,12 @@ def vector_db(supabase_client):
     
     # Mock the OpenAI client as well
     vector_db.openai_client = MagicMock()
-    vector_db.openai_client.embeddings.create.return_value.data = [MagicMock(embedding=[0.1] * 1536)]
+    vector_db.openai_client.embeddings.create.return_value.data = [MagicMock(embedding=_MOCK_EMBEDDING)]
     
     return vector_db
 
 
-@pytest.mark.asyncio
-async def test_vector_db_initialization(vector_db):
+def test_vector_db_initialization(vector_db):
     """Test that the vector database utility initializes correctly."""
     assert vector_db is not None
     assert vector_db.openai_client is not None